@@ -1,31 +1,53 @@
-import time
-import random
+import asyncio
+import hashlib
+import itertools
+import os
+import queue
 import re
-from typing import List, Dict, Tuple, Optional
-from urllib.parse import urlparse, urljoin, urldefrag
-from collections import deque
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import (
+    Awaitable, Callable, Iterator, List, Dict, NamedTuple, Tuple, Optional,
+)
+from urllib.parse import (
+    parse_qsl, urldefrag, urlencode, urljoin, urlparse, urlsplit, urlunsplit,
+)
 
-import requests
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
+from lxml import etree, html as lxml_html
 
-from app.services.js_renderer import render_js_page
+from app.metrics import FETCHES, STAGE_SECONDS, stage_timer, status_class
+from app.services.http_client import get_http_client
+from app.services.js_renderer import render_js_page_async
 
 
 # =========================
 # Crawler Defaults
 # =========================
-USER_AGENT = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) "
-    "Chrome/120 Safari/537.36"
-)
-
 MAX_PAGES = 40
 MAX_DEPTH = 2
 MIN_TEXT_LEN = 120
 POLITE_DELAY_SEC = 0.25
 
+# Concurrency (crawl workers / per-host in-flight fetches for one crawl;
+# the shared HTTP client caps the whole process, see http_client.py)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 16))
+CRAWL_PER_HOST_CONCURRENCY = int(os.getenv("CRAWL_PER_HOST_CONCURRENCY", 4))
+FETCH_TIMEOUT_SEC = 20
+
+# Sitemaps are shared by every source on an origin (batch ingest)
+SITEMAP_CACHE_TTL_SEC = float(os.getenv("SITEMAP_CACHE_TTL_SEC", 600))
+
+# Sitemap traversal bounds (indexes are followed, .xml.gz included)
+SITEMAP_MAX_URLS = int(os.getenv("SITEMAP_MAX_URLS", 5000))
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", 50))
+SITEMAP_MAX_DEPTH = 3
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024   # per file, uncompressed (protocol cap)
+
+# Other URLs remembered per page (incremental state), see smart_crawl_async
+MAX_ALIASES = 20
+
 USE_SITEMAP = True
 USE_COMMON_ROUTES = True
 
@@ -36,6 +58,26 @@ SKIP_EXTENSIONS = (
     ".css", ".js", ".json"
 )
 
+# Query params that never change what a page shows (tracking, sessions);
+# comma-separated, a trailing * matches a prefix
+CANONICAL_STRIP_PARAMS = [
+    p.strip().lower()
+    for p in os.getenv(
+        "CANONICAL_STRIP_PARAMS",
+        "utm_*,gclid,gbraid,wbraid,dclid,fbclid,msclkid,yclid,igshid,"
+        "mc_cid,mc_eid,_ga,_gl,_hsenc,_hsmi,mkt_tok,ref,ref_src,trk,"
+        "sessionid,session_id,sid,phpsessid,jsessionid,aspsessionid,"
+        "cfid,cftoken",
+    ).split(",")
+    if p.strip()
+]
+# Page identity (visited set): http vs https, www. vs bare host
+CANONICAL_IGNORE_SCHEME = os.getenv("CANONICAL_IGNORE_SCHEME", "true").lower() == "true"
+CANONICAL_IGNORE_WWW = os.getenv("CANONICAL_IGNORE_WWW", "true").lower() == "true"
+
+_SESSION_PATH_PARAM = re.compile(r";(jsessionid|phpsessid|sid)=[^/]*", re.IGNORECASE)
+_INDEX_FILE = re.compile(r"/(index|default)\.(html?|php|aspx?)$", re.IGNORECASE)
+
 COMMON_PATHS = [
     "/about", "/about-us", "/company", "/team",
     "/contact", "/contact-us", "/support",
@@ -45,6 +87,12 @@ COMMON_PATHS = [
 ]
 
 
+class CrawlStopped(Exception):
+    """
+    Raised by a `sink` to end the crawl early.
+    """
+
+
 # =========================
 # URL helpers
 # =========================
@@ -52,19 +100,90 @@ def normalize_url(url: str) -> str:
     url = (url or "").strip()
     if not url:
         return url
-    if not url.startswith(("http://", "https://")):
+    if not url.lower().startswith(("http://", "https://")):
         url = "https://" + url
     url, _ = urldefrag(url)
     return url.rstrip("/")
 
 
+def _strip_param(name: str) -> bool:
+    name = name.lower()
+    return any(
+        name.startswith(p[:-1]) if p.endswith("*") else name == p
+        for p in CANONICAL_STRIP_PARAMS
+    )
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    normalize_url, plus: lowercase scheme / host, default port, session
+    path params (;jsessionid=...), index files and tracking / session
+    query params (CANONICAL_STRIP_PARAMS) removed, remaining params
+    sorted. The result is still the URL to fetch.
+    """
+    url = normalize_url(url)
+    if not url:
+        return url
+
+    p = urlsplit(url)
+    scheme = p.scheme.lower()
+    host = p.hostname or ""
+    if ":" in host:
+        host = f"[{host}]"   # IPv6
+    try:
+        port = p.port
+    except ValueError:
+        port = None
+    if port and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+
+    path = _SESSION_PATH_PARAM.sub("", p.path)
+    path = _INDEX_FILE.sub("/", path)
+    path = re.sub(r"/{2,}", "/", path).rstrip("/")
+
+    query = urlencode(sorted(
+        (k, v)
+        for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if not _strip_param(k)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def _site_host(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    if CANONICAL_IGNORE_WWW and host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+def url_identity(url: str) -> str:
+    """
+    Dedup key for "same page": canonicalize_url, with http / https and
+    www. / bare host treated alike (CANONICAL_IGNORE_SCHEME / _WWW).
+    """
+    url = canonicalize_url(url)
+    if not url:
+        return url
+    p = urlsplit(url)
+    host = _site_host(url) + (f":{p.port}" if p.port else "")
+    scheme = "" if CANONICAL_IGNORE_SCHEME else f"{p.scheme}:"
+    return f"{scheme}//{host}{p.path}" + (f"?{p.query}" if p.query else "")
+
+
+def text_digest(text: str) -> str:
+    """
+    Same page content, ignoring whitespace (rel=canonical check).
+    """
+    return hashlib.sha1(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
 def base_origin(url: str) -> str:
     p = urlparse(url)
     return f"{p.scheme}://{p.netloc}"
 
 
 def same_domain(root_url: str, other_url: str) -> bool:
-    return urlparse(root_url).hostname == urlparse(other_url).hostname
+    return _site_host(root_url) == _site_host(other_url)
 
 
 def should_skip_url(url: str) -> bool:
@@ -78,189 +197,880 @@ def clean_text(text: str) -> str:
     return re.sub(r"\s+", " ", (text or "")).strip()
 
 
-def extract_main_text(html: str) -> Tuple[str, str]:
-    soup = BeautifulSoup(html, "html.parser")
+_SHELL_MARKERS = ("id=\"root\"", "id=\"app\"", "__next", "react", "vite", "webpack")
+_BOILERPLATE_TAGS = (
+    "script", "style", "noscript", "svg",
+    "header", "footer", "nav", "aside",
+)
 
-    for tag in soup(["script", "style", "noscript", "svg"]):
-        tag.decompose()
-    for tag in soup(["header", "footer", "nav", "aside"]):
-        tag.decompose()
 
-    title = clean_text(soup.title.get_text(" ")) if soup.title else ""
+def parse_html(html: str):
+    """
+    lxml document, or None for empty / unparsable input.
+    """
+    if not html:
+        return None
+    try:
+        return lxml_html.document_fromstring(
+            html.encode("utf-8", "replace"),
+            parser=lxml_html.HTMLParser(encoding="utf-8"),
+        )
+    except (etree.ParserError, ValueError):
+        return None
 
-    main = soup.find("main") or soup.find("article")
-    if main:
-        text = clean_text(main.get_text(" "))
-    else:
-        text = clean_text(soup.get_text(" "))
 
-    return title, text
+def _text(el) -> str:
+    return clean_text(" ".join(el.itertext()))
 
 
-def extract_links(current_url: str, html: str, root_url: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    links = set()
+def _is_js_shell(html: str, doc) -> bool:
+    if not html or len(html) < 2000 or doc is None:
+        return True
+
+    lower = html.lower()
+    if sum(m in lower for m in _SHELL_MARKERS) >= 2:
+        return True
+
+    body = doc.body
+    return len(_text(body if body is not None else doc)) < 200
 
-    for a in soup.select("a[href]"):
+
+def _outlinks(doc, current_url: str, root_url: str) -> List[str]:
+    links = {}
+
+    for a in doc.iter("a"):
         href = (a.get("href") or "").strip()
         if not href:
             continue
-        abs_url = normalize_url(urljoin(current_url, href))
+        abs_url = canonicalize_url(urljoin(current_url, href))
         if (
             abs_url.startswith(("http://", "https://"))
             and same_domain(root_url, abs_url)
             and not should_skip_url(abs_url)
         ):
-            links.add(abs_url)
+            links[abs_url] = None
 
     return list(links)
 
 
-def looks_like_js_shell(html: str) -> bool:
-    if not html or len(html) < 2000:
-        return True
+def _canonical_link(doc, current_url: str) -> Optional[str]:
+    for link in doc.iter("link"):
+        rel = (link.get("rel") or "").lower().split()
+        href = (link.get("href") or "").strip()
+        if "canonical" in rel and href:
+            url = canonicalize_url(urljoin(current_url, href))
+            return url if url.startswith(("http://", "https://")) else None
+    return None
 
-    markers = ["id=\"root\"", "id=\"app\"", "__next", "react", "vite", "webpack"]
-    score = sum(m in html.lower() for m in markers)
 
-    soup = BeautifulSoup(html, "html.parser")
-    body_text = clean_text(
-        soup.body.get_text(" ") if soup.body else soup.get_text(" ")
-    )
+def _main_text(doc) -> Tuple[str, str]:
+    etree.strip_elements(doc, *_BOILERPLATE_TAGS, with_tail=False)
+
+    title_el = doc.find(".//title")
+    title = _text(title_el) if title_el is not None else ""
+
+    main = doc.find(".//main")
+    if main is None:
+        main = doc.find(".//article")
+
+    return title, _text(main if main is not None else doc)
+
+
+def parse_page(html: str, current_url: str, root_url: str) -> Dict:
+    """
+    One lxml parse per page:
+    {"js_shell", "title", "text", "links", "canonical"}
 
-    return score >= 2 or len(body_text) < 200
+    Links are read from the full document (nav included), text from
+    <main>/<article> (or the whole page) with boilerplate removed.
+    `canonical` is the <link rel="canonical"> target, if any.
+    """
+    with stage_timer("parse"):
+        doc = parse_html(html)
+        if doc is None:
+            return {
+                "js_shell": True, "title": "", "text": "", "links": [],
+                "canonical": None,
+            }
+
+        js_shell = _is_js_shell(html, doc)
+        links = _outlinks(doc, current_url, root_url)
+        canonical = _canonical_link(doc, current_url)
+        title, text = _main_text(doc)   # strips boilerplate → must run last
+
+    return {
+        "js_shell": js_shell,
+        "title": title,
+        "text": text,
+        "links": links,
+        "canonical": canonical,
+    }
+
+
+# Single-purpose wrappers (each parses the page once more; prefer parse_page)
+def extract_main_text(html: str) -> Tuple[str, str]:
+    doc = parse_html(html)
+    return _main_text(doc) if doc is not None else ("", "")
+
+
+def extract_links(current_url: str, html: str, root_url: str) -> List[str]:
+    doc = parse_html(html)
+    return _outlinks(doc, current_url, root_url) if doc is not None else []
+
+
+def looks_like_js_shell(html: str) -> bool:
+    return _is_js_shell(html, parse_html(html))
 
 
 # =========================
 # Fetch HTML
 # =========================
-def fetch_html_requests(url: str, timeout: int = 20) -> Optional[str]:
+def conditional_headers(known: Optional[Dict]) -> Dict[str, str]:
+    """
+    If-None-Match / If-Modified-Since from a previous crawl's validators.
+    """
+    headers = {}
+    if known:
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("lastModified"):
+            headers["If-Modified-Since"] = known["lastModified"]
+    return headers
+
+
+async def fetch_html_async(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[int, Optional[str], Dict[str, str], str]:
+    """
+    Returns (status, html, validators, final url after redirects).
+    status 0 = network error or an oversized body.
+    """
+    t0 = time.perf_counter()
+    status = 0
     try:
-        r = requests.get(
+        r = await get_http_client().get_async(
             url,
-            headers={"User-Agent": USER_AGENT},
-            timeout=timeout,
-            allow_redirects=True,
+            headers=headers,
+            timeout=FETCH_TIMEOUT_SEC,
         )
-        if r.status_code != 200:
-            return None
-        return r.text or ""
+        status = r.status
+        validators = {
+            "etag": r.headers.get("etag"),
+            "lastModified": r.headers.get("last-modified"),
+        }
+        if r.status != 200:
+            return r.status, None, validators, r.url
+        return 200, r.text or "", validators, r.url
     except Exception:
-        return None
+        return 0, None, {}, url
+    finally:
+        FETCHES.labels(status=status_class(status)).inc()
+        STAGE_SECONDS.labels(
+            stage="fetch",
+            outcome="ok" if status in (200, 304) else "error",
+        ).observe(time.perf_counter() - t0)
 
 
-def fetch_html(url: str) -> Optional[str]:
-    html = fetch_html_requests(url)
-    if html and not looks_like_js_shell(html):
-        return html
+async def fetch_html(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[int, Optional[str], Dict[str, str]]:
+    status, html, validators, _ = await fetch_html_async(url, headers)
+    # Errors (404 / 5xx / network) are reported, never rendered over
+    if status != 200 or (html and not looks_like_js_shell(html)):
+        return status, html, validators
 
-    # JS-render fallback
+    # JS-render fallback (shared browser pool)
     try:
-        return render_js_page(url)
+        with stage_timer("render"):
+            html = await render_js_page_async(url)
+        return 200, html, validators
     except Exception:
-        return html
+        return status, html, validators
+
+
+async def fetch_page(
+    url: str,
+    root_url: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[int, Optional[Dict], Dict[str, str]]:
+    """
+    Like fetch_html, but returns the parse_page result; the page is
+    parsed once (twice only when it had to be JS-rendered).
+
+    The page also gets `final_url`: the URL it redirected to, else `url`.
+    Off-domain `canonical` / redirect targets are dropped.
+
+    Only a 200 that is empty or a JS shell is rendered; any other status
+    comes back as is, with page=None.
+    """
+    status, html, validators, final_url = await fetch_html_async(url, headers)
+    if status != 200:
+        return status, None, validators
+
+    page = parse_page(html, final_url, root_url) if html else None
+    if not page or page["js_shell"]:
+        # JS-render fallback (shared browser pool)
+        try:
+            with stage_timer("render"):
+                rendered = await render_js_page_async(url)
+            status, page = 200, parse_page(rendered, final_url, root_url)
+        except Exception:
+            pass
+
+    if page:
+        final_url = canonicalize_url(final_url)
+        page["final_url"] = final_url if same_domain(root_url, final_url) else url
+        if page["canonical"] and not same_domain(root_url, page["canonical"]):
+            page["canonical"] = None
+    return status, page, validators
 
 
 # =========================
 # Sitemap helpers
 # =========================
-def parse_sitemap(xml_text: str, root_url: str, limit: int = 300) -> List[str]:
-    urls = []
+class SitemapEntry(NamedTuple):
+    url: str
+    lastmod: Optional[str]
+    priority: Optional[float]
+
+
+def _local_name(tag) -> str:
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+class SitemapReader:
+    """
+    Incremental sitemap parser. Bytes (plain or gzip) are fed as they
+    arrive; each finished <url> / <sitemap> element is read and freed,
+    so a 50 MB sitemap never sits in memory as a tree.
+
+    - pages:    page entries on root_url's domain (up to `limit`)
+    - children: sitemap URLs listed by a sitemap index
+    """
+
+    def __init__(self, root_url: str, limit: int = SITEMAP_MAX_URLS):
+        self.root_url = root_url
+        self.limit = limit
+        self.parser = etree.XMLPullParser(
+            events=("end",),
+            resolve_entities=False,
+            no_network=True,
+        )
+        self.gunzip = None
+        self.started = False
+        self.size = 0
+        self.pages: List[SitemapEntry] = []
+        self.children: List[str] = []
+
+    @property
+    def full(self) -> bool:
+        return len(self.pages) >= self.limit
+
+    def feed(self, data: bytes):
+        if not self.started:
+            self.started = True
+            if data[:2] == b"\x1f\x8b":   # .xml.gz served as a file
+                self.gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self.gunzip is not None:
+            # Output capped just past the limit (gzip bombs stop here)
+            data = self.gunzip.decompress(data, SITEMAP_MAX_BYTES - self.size + 1)
+
+        self.size += len(data)
+        if self.size > SITEMAP_MAX_BYTES:
+            raise ValueError("Sitemap exceeds size limit")
+
+        self.parser.feed(data)
+        self._read_events()
+
+    def close(self):
+        self.parser.close()
+        self._read_events()
+
+    def _read_events(self):
+        for _, elem in self.parser.read_events():
+            kind = _local_name(elem.tag)
+            if kind not in ("url", "sitemap"):
+                continue
+
+            fields = {_local_name(c.tag): (c.text or "").strip() for c in elem}
+            loc = fields.get("loc")
+
+            if loc and kind == "sitemap":
+                if loc.startswith(("http://", "https://")):
+                    self.children.append(loc)
+            elif loc and not self.full:
+                url = canonicalize_url(loc)
+                if same_domain(self.root_url, url) and not should_skip_url(url):
+                    self.pages.append(SitemapEntry(
+                        url,
+                        fields.get("lastmod") or None,
+                        _sitemap_priority(fields.get("priority")),
+                    ))
+
+            # Free the element and everything before it
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+def _sitemap_priority(value: Optional[str]) -> Optional[float]:
     try:
-        root = ET.fromstring(xml_text)
-        for elem in root.iter():
-            if elem.tag.lower().endswith("loc"):
-                u = normalize_url(elem.text or "")
-                if same_domain(root_url, u) and not should_skip_url(u):
-                    urls.append(u)
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_sitemap_entries(
+    xml_text: str,
+    root_url: str,
+    limit: int = SITEMAP_MAX_URLS,
+) -> List[SitemapEntry]:
+    """
+    Page entries from one sitemap document (index children not followed).
+    """
+    reader = SitemapReader(root_url, limit)
+    try:
+        reader.feed(xml_text.encode("utf-8"))
+        reader.close()
     except Exception:
         pass
+    return reader.pages
+
+
+def parse_sitemap(xml_text: str, root_url: str, limit: int = SITEMAP_MAX_URLS) -> List[str]:
+    return [e.url for e in parse_sitemap_entries(xml_text, root_url, limit)]
+
+
+async def _read_sitemap(url: str, reader: SitemapReader):
+    def feed(data: bytes) -> bool:
+        reader.feed(data)
+        return reader.full
+
+    try:
+        r = await get_http_client().get_async(url, timeout=15, on_chunk=feed)
+        if r.status == 200 and not reader.full:
+            reader.close()
+    except Exception:
+        pass   # missing / broken sitemap: keep whatever was read
+
+
+async def _sitemap_roots(base: str) -> List[str]:
+    """
+    `Sitemap:` lines from robots.txt, plus the conventional locations.
+    """
+    roots = []
+    try:
+        r = await get_http_client().get_async(f"{base}/robots.txt", timeout=10)
+        if r.status == 200:
+            for line in r.text.splitlines():
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "sitemap" and value.strip():
+                    roots.append(value.strip())
+    except Exception:
+        pass
+    roots += [f"{base}/sitemap.xml", f"{base}/sitemap_index.xml"]
+    return list(dict.fromkeys(roots))
 
-    seen = set()
-    out = []
-    for u in urls:
-        if u not in seen:
-            seen.add(u)
-            out.append(u)
-        if len(out) >= limit:
-            break
-    return out
 
+# origin → (fetched at, entries)
+_SITEMAP_CACHE: Dict[str, Tuple[float, List[SitemapEntry]]] = {}
 
-def load_sitemap_urls(root_url: str) -> List[str]:
+
+async def load_sitemap_entries(root_url: str) -> List[SitemapEntry]:
+    """
+    Sitemap entries for root_url's origin, fetched at most once per
+    SITEMAP_CACHE_TTL_SEC per process.
+
+    Sitemap indexes are followed level by level (gzip included), up to
+    SITEMAP_MAX_DEPTH levels, SITEMAP_MAX_FILES files and
+    SITEMAP_MAX_URLS entries.
+    """
     base = base_origin(root_url)
-    sitemap_urls = [
-        f"{base}/sitemap.xml",
-        f"{base}/sitemap_index.xml",
-    ]
 
-    found = []
-    for sm in sitemap_urls:
-        try:
-            r = requests.get(sm, headers={"User-Agent": USER_AGENT}, timeout=15)
-            if r.status_code == 200 and r.text.strip().startswith("<"):
-                found.extend(parse_sitemap(r.text, root_url))
-        except Exception:
-            pass
+    cached = _SITEMAP_CACHE.get(base)
+    if cached and time.monotonic() - cached[0] < SITEMAP_CACHE_TTL_SEC:
+        return cached[1]
+
+    found: Dict[str, SitemapEntry] = {}
+    fetched = set()
+    pending = await _sitemap_roots(base)
+
+    for _ in range(SITEMAP_MAX_DEPTH + 1):
+        batch = [u for u in dict.fromkeys(pending) if u not in fetched]
+        batch = batch[:SITEMAP_MAX_FILES - len(fetched)]
+        if not batch:
+            break
+        fetched.update(batch)
+
+        readers = [SitemapReader(root_url) for _ in batch]
+        await asyncio.gather(*(
+            _read_sitemap(u, r) for u, r in zip(batch, readers)
+        ))
+
+        pending = []
+        for reader in readers:
+            for entry in reader.pages:
+                found.setdefault(entry.url, entry)
+            pending.extend(reader.children)
+
+        if len(found) >= SITEMAP_MAX_URLS:
+            break
+
+    entries = list(found.values())[:SITEMAP_MAX_URLS]
+    _SITEMAP_CACHE[base] = (time.monotonic(), entries)
+    return entries
+
+
+# =========================
+# URL scoring (crawl frontier)
+# =========================
+# Listing / account / utility pages: crawled last
+_LOW_VALUE_PATH = re.compile(
+    r"/(tags?|category|categories|author|page|archive|search|login|"
+    r"sign-?in|sign-?up|register|cart|checkout|account|feed)(/|$)",
+    re.IGNORECASE,
+)
+_HIGH_VALUE_PATH = re.compile(
+    r"/(docs?|documentation|guides?|help|faq|about|pricing|features|"
+    r"products?|services?)(/|$)",
+    re.IGNORECASE,
+)
+
+# Half-life of the sitemap <lastmod> recency bonus
+LASTMOD_HALF_LIFE_DAYS = 180
+
+
+def _age_days(lastmod: str) -> Optional[float]:
+    try:
+        dt = datetime.fromisoformat(lastmod.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - dt).total_seconds() / 86400)
+
+
+def url_score(url: str, depth: int, entry: Optional[SitemapEntry] = None) -> float:
+    """
+    Crawl value of a URL (higher first): sitemap priority and lastmod,
+    link depth, path depth and path keywords.
+    """
+    parts = urlparse(url)
+    segments = [s for s in parts.path.split("/") if s]
+
+    score = entry.priority if entry and entry.priority is not None else 0.5
+    score += 0.5 / (1 + depth)
+    score += 0.3 / (1 + len(segments))
+
+    if entry and entry.lastmod:
+        age = _age_days(entry.lastmod)
+        if age is not None:
+            score += 0.3 * 0.5 ** (age / LASTMOD_HALF_LIFE_DAYS)
+
+    if _HIGH_VALUE_PATH.search(parts.path):
+        score += 0.2
+    if _LOW_VALUE_PATH.search(parts.path):
+        score -= 0.5
+    if parts.query:
+        score -= 0.2
+
+    return score
+
+
+# =========================
+# Crawl setup
+# =========================
+async def seed_urls(root_url: str) -> Tuple[List[str], Dict[str, SitemapEntry]]:
+    """
+    Root + COMMON_PATHS + sitemap URLs, and the sitemap entry per URL.
+    """
+    seeds = [root_url]
+
+    if USE_COMMON_ROUTES:
+        origin = base_origin(root_url)
+        for p in COMMON_PATHS:
+            seeds.append(canonicalize_url(origin + p))
+
+    sitemap: Dict[str, SitemapEntry] = {}
+    if USE_SITEMAP:
+        for entry in await load_sitemap_entries(root_url):
+            sitemap[entry.url] = entry
+            seeds.append(entry.url)
 
-    return found
+    return seeds, sitemap
 
 
 # =========================
 # SMART CRAWLER (MAIN)
 # =========================
-def smart_crawl(
+async def smart_crawl_async(
     root_url: str,
     max_pages: int = MAX_PAGES,
     max_depth: int = MAX_DEPTH,
-) -> List[Dict[str, str]]:
-    root_url = normalize_url(root_url)
-    origin = base_origin(root_url)
+    concurrency: int = CRAWL_CONCURRENCY,
+    per_host_concurrency: int = CRAWL_PER_HOST_CONCURRENCY,
+    prior: Optional[Dict[str, Dict]] = None,
+    on_page: Optional[Callable[[int], None]] = None,
+    sink: Optional[Callable[[Dict], Awaitable[None]]] = None,
+    seeds: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Concurrent best-first crawl.
+
+    - `concurrency` workers pull the highest-scored URL (url_score:
+      sitemap priority / lastmod, depth, path) from a shared frontier,
+      so the `max_pages` budget goes to the most valuable pages
+    - each host is capped at `per_host_concurrency` in-flight fetches,
+      and every fetch holds its host slot for POLITE_DELAY_SEC
+    - stops scheduling new fetches once `max_pages` pages are kept
+    - `on_page(n)` is called with the running page count
+    - `await sink(page)` is called for every kept page (back-pressure:
+      a slow sink pauses the crawl worker that produced the page)
+    - `seeds` replaces the default seeds (root, COMMON_PATHS, sitemap);
+      with max_depth=0 exactly those URLs are fetched
+    - URLs are deduplicated by url_identity, before fetching (tracking
+      params, www., http/https, index files) and after: a redirect
+      target is always the same page, a rel=canonical target only when
+      the text kept there is the same (templates often point every
+      page's canonical at / or a category)
+
+    Incremental mode (`prior` = per-URL state from the last crawl):
+    - unchanged sitemap `lastmod` → page is not fetched at all
+    - otherwise a conditional GET; 304 → page is not re-extracted
+    - unchanged pages come back as {"url", "status": "unchanged", ...}
+      with `text` empty; their stored links are still followed
+    - known pages answering 404/410 come back as {"status": "gone"}
+    - known pages that could not be fetched this time (network error,
+      timeout, 5xx / 429, failed JS render, too little text) come back
+      as {"status": "error"}, so their old state can be kept
+    - every entry carries `status`, `etag`, `lastModified`, `lastmod`,
+      `links`, `aliases` (other URLs that led to the page)
+    - prior state is matched by url_identity, aliases included, so a
+      page kept under its canonical URL is found however it is reached
+    """
+    root_url = canonicalize_url(root_url)
+    incremental = prior is not None
+    prior = prior or {}
+
+    # url_identity → prior key (stored URLs first, then their aliases)
+    prior_ids: Dict[str, str] = {url_identity(k): k for k in prior}
+    for k, known in prior.items():
+        for alias in known.get("aliases") or []:
+            prior_ids.setdefault(url_identity(alias), k)
 
-    visited = set()
-    pages: List[Dict[str, str]] = []
+    visited: Dict[str, str] = {}   # url_identity → first URL seen
+    kept_text: Dict[str, str] = {}   # url_identity → text_digest of kept page
+    duplicates = 0
+    pages: List[Dict] = []
+    gone: List[Dict] = []
+    failed: List[Dict] = []
+    halted = asyncio.Event()
+    host_limits: Dict[str, asyncio.Semaphore] = {}
 
     # -------- Seed URLs --------
-    seeds = [root_url]
+    if seeds is None:
+        seeds, sitemap = await seed_urls(root_url)
+    else:
+        seeds, sitemap = [canonicalize_url(u) for u in seeds], {}
 
-    if USE_COMMON_ROUTES:
-        for p in COMMON_PATHS:
-            seeds.append(normalize_url(origin + p))
+    # Frontier: (-score, insertion order, url, depth)
+    frontier: asyncio.PriorityQueue = asyncio.PriorityQueue()
+    order = itertools.count()
 
-    if USE_SITEMAP:
-        seeds.extend(load_sitemap_urls(root_url))
+    def push(url: str, depth: int):
+        score = url_score(url, depth, sitemap.get(url))
+        if url == root_url:
+            score += 1.0   # its links drive discovery
+        frontier.put_nowait((-score, next(order), url, depth))
 
-    queue = deque((u, 0) for u in seeds if u)
+    for u in dict.fromkeys(seeds):
+        if u:
+            push(u, 0)
 
-    # -------- Crawl --------
-    while queue and len(pages) < max_pages:
-        url, depth = queue.popleft()
-        if url in visited or depth > max_depth:
-            continue
+    def host_limit(url: str) -> asyncio.Semaphore:
+        host = urlparse(url).hostname or ""
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(per_host_concurrency)
+        return host_limits[host]
 
-        visited.add(url)
+    def follow(links: List[str], depth: int):
+        if depth < max_depth:
+            for link in links:
+                if url_identity(link) not in visited:
+                    push(link, depth + 1)
 
-        html = fetch_html(url)
-        if not html:
-            continue
+    async def keep(page: Dict):
+        pages.append(page)
+        if on_page:
+            on_page(len(pages))
+        if sink:
+            await sink(page)
 
-        title, text = extract_main_text(html)
-        if len(text) < MIN_TEXT_LEN:
-            continue
+    def claim(url: str, reached_as: str) -> bool:
+        """
+        Marks the page's own URL visited when it was reached through
+        another one; False if that page was already crawled.
+        """
+        key = url_identity(url)
+        if key == url_identity(reached_as):
+            return True
+        if key in visited:
+            return False
+        visited[key] = url
+        return True
 
-        pages.append({
+    async def keep_unchanged(url: str, depth: int, known: Dict):
+        await keep({
+            **known,
             "url": url,
-            "title": title,
-            "text": text,
+            "title": known.get("title", ""),
+            "text": "",
+            "status": "unchanged",
         })
+        follow(known.get("links") or [], depth)
 
-        if depth < max_depth:
-            links = extract_links(url, html, root_url)
-            random.shuffle(links)
-            for link in links:
-                if link not in visited:
-                    queue.append((link, depth + 1))
+    async def crawl_one(url: str, depth: int):
+        nonlocal duplicates
+        prior_url = prior_ids.get(url_identity(url), url)
+        known = prior.get(prior_url)
+        entry = sitemap.get(url)
+        lastmod = entry.lastmod if entry else None
+
+        async def unchanged(known: Dict):
+            nonlocal duplicates
+            if claim(prior_url, url):
+                await keep_unchanged(prior_url, depth, known)
+            else:
+                duplicates += 1
+
+        if known and lastmod and known.get("lastmod") == lastmod:
+            await unchanged(known)
+            return
+
+        async with host_limit(url):
+            status, parsed, validators = await fetch_page(
+                url, root_url, conditional_headers(known)
+            )
+            await asyncio.sleep(POLITE_DELAY_SEC)
+
+        if len(pages) >= max_pages:
+            return
+
+        if status == 304 and known:
+            await unchanged({
+                **known,
+                **{k: v for k, v in validators.items() if v},
+                "lastmod": lastmod,
+            })
+            return
+
+        if status in (404, 410) and known:
+            if prior_url == url:
+                gone.append({"url": url, "status": "gone"})
+            else:
+                # A dead alias says nothing about the page it led to
+                failed.append({"url": prior_url, "status": "error"})
+            return
+
+        if not parsed or len(parsed["text"]) < MIN_TEXT_LEN:
+            if known:
+                failed.append({"url": prior_url, "status": "error"})
+            return
+
+        # Redirect target: one page, however it was reached
+        final_url = parsed["final_url"]
+        if not claim(final_url, url):
+            duplicates += 1
+            return
+
+        # rel=canonical: only trusted when the text kept there matches
+        digest = text_digest(parsed["text"])
+        canonical = parsed["canonical"]
+        if canonical and url_identity(canonical) != url_identity(final_url):
+            if kept_text.get(url_identity(canonical)) == digest:
+                duplicates += 1
+                return
+
+        aliases = set()
+        if known and prior_url == final_url:
+            aliases.update(known.get("aliases") or [])
+        if url_identity(url) != url_identity(final_url):
+            aliases.add(url)
+        url = final_url
+        kept_text[url_identity(url)] = digest
+
+        links = parsed["links"]
+
+        page = {
+            "url": url,
+            "title": parsed["title"],
+            "text": parsed["text"],
+        }
+        if incremental:
+            page.update(
+                status="fetched",
+                lastmod=lastmod,
+                links=links,
+                aliases=sorted(aliases)[:MAX_ALIASES],
+                **validators,
+            )
+        follow(links, depth)
+        await keep(page)
+
+    # -------- Crawl --------
+    async def worker():
+        nonlocal duplicates
+        while True:
+            _, _, url, depth = await frontier.get()
+            try:
+                key = url_identity(url)
+                if key in visited:
+                    duplicates += visited[key] != url
+                    continue
+                if depth > max_depth or len(pages) >= max_pages or halted.is_set():
+                    continue
+                visited[key] = url
+                await crawl_one(url, depth)
+            except CrawlStopped:
+                halted.set()
+            except Exception as e:
+                print(f"⚠️ Crawl failed for {url}: {e}")
+            finally:
+                frontier.task_done()
+
+    workers = [
+        asyncio.create_task(worker())
+        for _ in range(max(1, concurrency))
+    ]
+    try:
+        await frontier.join()
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    if duplicates:
+        print(f"🔗 Skipped {duplicates} duplicate URLs (same canonical page)")
+    return pages[:max_pages] + gone + failed
+
+
+def smart_crawl(
+    root_url: str,
+    max_pages: int = MAX_PAGES,
+    max_depth: int = MAX_DEPTH,
+    prior: Optional[Dict[str, Dict]] = None,
+    on_page: Optional[Callable[[int], None]] = None,
+    seeds: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Sync entrypoint (Celery task / FastAPI threadpool).
+    """
+    return asyncio.run(
+        smart_crawl_async(
+            root_url,
+            max_pages=max_pages,
+            max_depth=max_depth,
+            prior=prior,
+            on_page=on_page,
+            seeds=seeds,
+        )
+    )
+
+
+async def discover_urls_async(
+    root_url: str,
+    max_pages: int = MAX_PAGES,
+) -> List[str]:
+    """
+    Cheap URL discovery for fan-out: default seeds plus the root page's
+    outlinks, without fetching anything else. Root URL comes first,
+    then the rest by url_score.
+    """
+    root_url = canonicalize_url(root_url)
+
+    seeds, sitemap = await seed_urls(root_url)
+    _, parsed, _ = await fetch_page(root_url, root_url)
+
+    # One URL per url_identity (first seen wins)
+    seen = {url_identity(root_url)}
+    depth: Dict[str, int] = {}
+    links = parsed["links"] if parsed else []
+    for u, d in [*((u, 0) for u in seeds if u), *((u, 1) for u in links)]:
+        key = url_identity(u)
+        if key not in seen:
+            seen.add(key)
+            depth[u] = d
+
+    ranked = sorted(
+        depth,
+        key=lambda u: -url_score(u, depth[u], sitemap.get(u)),
+    )
+    return [root_url, *ranked][:max_pages]
 
-        time.sleep(POLITE_DELAY_SEC)
 
-    return pages
+def discover_urls(root_url: str, max_pages: int = MAX_PAGES) -> List[str]:
+    return asyncio.run(discover_urls_async(root_url, max_pages))
+
+
+def iter_crawl(
+    root_url: str,
+    max_pages: int = MAX_PAGES,
+    max_depth: int = MAX_DEPTH,
+    on_page: Optional[Callable[[int], None]] = None,
+    buffer_pages: int = 8,
+) -> Iterator[Dict]:
+    """
+    Streams crawled pages as they are found.
+
+    The crawl runs on a background thread and blocks once `buffer_pages`
+    pages are waiting to be consumed. Crawl errors are re-raised here.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=max(buffer_pages, 1))
+    done = object()
+    error: List[BaseException] = []
+    closed = threading.Event()
+
+    def put(item):
+        while not closed.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        raise CrawlStopped()
+
+    async def sink(page: Dict):
+        await asyncio.to_thread(put, page)
+
+    def run():
+        try:
+            asyncio.run(smart_crawl_async(
+                root_url,
+                max_pages=max_pages,
+                max_depth=max_depth,
+                on_page=on_page,
+                sink=sink,
+            ))
+        except BaseException as e:
+            error.append(e)
+        finally:
+            try:
+                put(done)
+            except CrawlStopped:
+                pass
+
+    threading.Thread(target=run, name="crawl", daemon=True).start()
+
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                break
+            yield page
+    finally:
+        closed.set()   # consumer gone → crawl stops at the next page
+
+    if error:
+        raise error[0]
@@ -1,5 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from app.config import APP_NAME, API_PREFIX
+from app.metrics import render_latest
 from app.routes import router
 
 app = FastAPI(
@@ -22,3 +23,11 @@ def health():
         "service": APP_NAME
     }
 
+
+# ---------------------------
+# Prometheus metrics
+# ---------------------------
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,151 @@
+# app/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+
+# Set this (to an empty, writable dir) when metrics come from several
+# processes: Celery prefork children, uvicorn --workers
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Worker-side /metrics (Celery exporter)
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", 9808))
+
+_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 120, 300, 600,
+)
+
+
+# -------------------------------------------------
+# Metrics
+# -------------------------------------------------
+STAGE_SECONDS = Histogram(
+    "ingest_stage_seconds",
+    "Time spent per ingestion stage",
+    ["stage", "outcome"],
+    buckets=_BUCKETS,
+)
+
+JOBS = Counter(
+    "ingest_jobs_total",
+    "Finished ingestion jobs",
+    ["source_type", "outcome"],
+)
+
+PAGES = Counter(
+    "ingest_pages_total",
+    "Pages extracted (web pages or PDF pages)",
+    ["source_type"],
+)
+
+CHUNKS = Counter(
+    "ingest_chunks_total",
+    "Chunks embedded and upserted",
+    ["source_type"],
+)
+
+OCR_PAGES = Counter(
+    "ingest_ocr_pages_total",
+    "PDF pages sent through OCR",
+)
+
+FETCHES = Counter(
+    "crawl_fetches_total",
+    "Crawler HTTP fetches by status class",
+    ["status"],
+)
+
+EMBED_TOKENS = Counter(
+    "embed_tokens_total",
+    "Tokens sent to the embedding API",
+)
+
+EMBED_THROTTLED = Counter(
+    "embed_throttled_total",
+    "Embedding requests rejected with 429",
+)
+
+EMBED_CACHE = Counter(
+    "embed_cache_lookups_total",
+    "Embedding cache lookups",
+    ["result"],
+)
+
+DEDUP_DROPPED = Counter(
+    "ingest_dedup_dropped_total",
+    "Duplicate pages / chunks and boilerplate sentences not embedded",
+    ["kind"],
+)
+
+DEDUP_TOKENS = Counter(
+    "ingest_dedup_tokens_saved_total",
+    "Tokens not embedded thanks to dedup",
+)
+
+UPSERT_VECTORS = Counter(
+    "pinecone_upsert_vectors_total",
+    "Vectors upserted to Pinecone",
+)
+
+
+# -------------------------------------------------
+# Helpers
+# -------------------------------------------------
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Observes the block's duration under outcome="ok" or "error".
+    """
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        STAGE_SECONDS.labels(stage=stage, outcome=outcome).observe(
+            time.perf_counter() - t0
+        )
+
+
+def status_class(status: int) -> str:
+    return f"{status // 100}xx" if status else "error"
+
+
+def _registry():
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_latest():
+    """
+    (body, content type) for a /metrics response.
+    """
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_exporter(port: int = CELERY_METRICS_PORT):
+    """
+    Serves /metrics from a background thread (Celery worker).
+    """
+    from prometheus_client import start_http_server
+
+    start_http_server(port, registry=_registry())
+
+
+def mark_process_dead(pid: int):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
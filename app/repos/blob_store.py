@@ -0,0 +1,152 @@
+# app/repos/blob_store.py
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# local | (s3 later)
+BLOB_STORE = os.getenv("BLOB_STORE", "local")
+
+# Must be a volume shared by the API and the Celery workers
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "/tmp/pinecone-blobs")
+
+# ⏱️ BLOB TTL (seconds) – default: 24 hours (same as jobs)
+BLOB_TTL_SECONDS = int(os.getenv("BLOB_TTL_SECONDS", 60 * 60 * 24))
+
+# Expired blobs are swept at most this often per process (off the
+# request path)
+BLOB_PURGE_INTERVAL_SEC = int(os.getenv("BLOB_PURGE_INTERVAL_SEC", 10 * 60))
+
+# 100 MB upload limit
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 100 * 1024 * 1024))
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+_LAST_PURGE = 0.0
+_PURGE_LOCK = threading.Lock()
+
+
+# -------------------------------------------------
+# Local / shared-volume store
+# -------------------------------------------------
+class LocalBlobStore:
+    """
+    Content-addressed blob handoff between API and workers.
+
+    Refs look like `sha256:<hex>` and are small enough for any task
+    message; workers resolve them with `local_path`.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, ref: str) -> str:
+        algo, _, digest = ref.partition(":")
+        if algo != "sha256" or len(digest) != 64 or not digest.isalnum():
+            raise ValueError(f"Invalid blob ref: {ref}")
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put_file(self, fileobj: BinaryIO, max_bytes: int = MAX_UPLOAD_SIZE) -> str:
+        """
+        Streams fileobj to disk while hashing it (never fully in memory).
+        """
+        self.maybe_purge()
+
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fileobj.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise BlobTooLarge(
+                            f"Upload exceeds size limit ({max_bytes // (1024 * 1024)}MB)"
+                        )
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            ref = f"sha256:{digest.hexdigest()}"
+            path = self._path(ref)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            if os.path.exists(path):
+                os.utime(path)   # same content already stored → refresh TTL
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+
+            return ref
+
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @contextmanager
+    def local_path(self, ref: str) -> Iterator[str]:
+        path = self._path(ref)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Blob not found: {ref}")
+        yield path
+
+    def delete(self, ref: str):
+        try:
+            os.remove(self._path(ref))
+        except FileNotFoundError:
+            pass
+
+    def maybe_purge(self):
+        """
+        Starts purge_expired on a background thread if the last sweep in
+        this process is older than BLOB_PURGE_INTERVAL_SEC.
+        """
+        global _LAST_PURGE
+        with _PURGE_LOCK:
+            now = time.monotonic()
+            if _LAST_PURGE and now - _LAST_PURGE < BLOB_PURGE_INTERVAL_SEC:
+                return
+            _LAST_PURGE = now
+        threading.Thread(
+            target=self.purge_expired,
+            name="blob-purge",
+            daemon=True,
+        ).start()
+
+    def purge_expired(self):
+        cutoff = time.time() - BLOB_TTL_SECONDS
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+
+# -------------------------------------------------
+# Factory
+# -------------------------------------------------
+def get_blob_store() -> LocalBlobStore:
+    if BLOB_STORE == "local":
+        return LocalBlobStore()
+    raise RuntimeError(f"Unsupported BLOB_STORE: {BLOB_STORE}")
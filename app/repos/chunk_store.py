@@ -0,0 +1,117 @@
+# app/repos/chunk_store.py
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# none → chunk text stays in Pinecone metadata | sqlite → text kept here
+CHUNK_STORE = os.getenv("CHUNK_STORE", "none")
+
+# Must be on a volume shared by the API and the Celery workers
+# (local disk / block volume: SQLite locking is unreliable over NFS)
+CHUNK_STORE_PATH = os.getenv(
+    "CHUNK_STORE_PATH", "/tmp/pinecone-chunks/chunks.sqlite3"
+)
+
+# SQLite host-parameter limit stays well clear of this
+_SQL_BATCH = 500
+
+
+class SqliteChunkStore:
+    """
+    Chunk text keyed by (userId, chunkId), so Pinecone metadata only
+    carries the small filterable fields.
+
+    Several processes may write: WAL mode + busy timeout, and one
+    connection per process (reopened after fork).
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.pid = None
+        self.db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self.db is None or self.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " user_id TEXT NOT NULL,"
+                " chunk_id TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " PRIMARY KEY (user_id, chunk_id)) WITHOUT ROWID"
+            )
+            db.commit()
+            self.db, self.pid = db, os.getpid()
+        return self.db
+
+    def put_many(self, userId: str, texts: Dict[str, str]):
+        if not texts:
+            return
+        with self.lock:
+            db = self._conn()
+            db.executemany(
+                "INSERT OR REPLACE INTO chunks (user_id, chunk_id, text)"
+                " VALUES (?, ?, ?)",
+                [(userId, cid, text) for cid, text in texts.items()],
+            )
+            db.commit()
+
+    def get_many(self, userId: str, chunkIds: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        with self.lock:
+            db = self._conn()
+            for i in range(0, len(chunkIds), _SQL_BATCH):
+                part = chunkIds[i:i + _SQL_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = db.execute(
+                    f"SELECT chunk_id, text FROM chunks"
+                    f" WHERE user_id = ? AND chunk_id IN ({marks})",
+                    (userId, *part),
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def delete_ids(self, userId: str, chunkIds: List[str]):
+        with self.lock:
+            db = self._conn()
+            for i in range(0, len(chunkIds), _SQL_BATCH):
+                part = chunkIds[i:i + _SQL_BATCH]
+                marks = ",".join("?" * len(part))
+                db.execute(
+                    f"DELETE FROM chunks WHERE user_id = ? AND chunk_id IN ({marks})",
+                    (userId, *part),
+                )
+            db.commit()
+
+    def delete_user(self, userId: str):
+        with self.lock:
+            db = self._conn()
+            db.execute("DELETE FROM chunks WHERE user_id = ?", (userId,))
+            db.commit()
+
+
+# -------------------------------------------------
+# Factory
+# -------------------------------------------------
+_STORE: Optional[SqliteChunkStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_chunk_store() -> Optional[SqliteChunkStore]:
+    global _STORE
+    if CHUNK_STORE == "none":
+        return None
+    if CHUNK_STORE != "sqlite":
+        raise RuntimeError(f"Unsupported CHUNK_STORE: {CHUNK_STORE}")
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = SqliteChunkStore()
+        return _STORE
@@ -0,0 +1,88 @@
+# app/repos/crawl_state.py
+import hashlib
+import json
+import os
+from typing import Dict
+from dotenv import load_dotenv
+
+from app.repos.redis_jobs import get_redis_pool
+
+load_dotenv()
+
+USE_CELERY = os.getenv("USE_CELERY", "true").lower() == "true"
+
+# 🔑 REDIS KEY PREFIX (CHANGE PER APP)
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "pinecone:")
+
+# ⏱️ STATE TTL (seconds) – default: 90 days, refreshed on every crawl
+CRAWL_STATE_TTL_SECONDS = int(
+    os.getenv("CRAWL_STATE_TTL_SECONDS", 60 * 60 * 24 * 90)
+)
+
+# -------------------------------------------------
+# Per-URL crawl state for incremental re-crawls,
+# scoped to (userId, source):
+#
+#   url -> {
+#       etag, lastModified,   # HTTP validators
+#       lastmod,              # sitemap <lastmod>
+#       hash,                 # normalized text hash
+#       chunks,               # vectors stored for the page
+#       title, links,         # replayed when unchanged
+#       aliases,              # other URLs that led here (redirects, ...)
+#       misses,               # complete crawls in a row it was missing from
+#   }
+# -------------------------------------------------
+
+
+def _source_key(userId: str, source: str) -> str:
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    return f"{REDIS_PREFIX}crawl:{userId}:{digest}"
+
+
+# -------------------------------------------------
+# In-memory fallback (LOCAL DEV)
+# -------------------------------------------------
+_IN_MEMORY_STATE = {}
+
+
+class InMemoryCrawlStateRepo:
+    def load(self, userId: str, source: str) -> Dict[str, Dict]:
+        return dict(_IN_MEMORY_STATE.get(_source_key(userId, source), {}))
+
+    def save(self, userId: str, source: str, state: Dict[str, Dict]):
+        _IN_MEMORY_STATE[_source_key(userId, source)] = dict(state)
+
+
+# -------------------------------------------------
+# Redis-backed repo (PRODUCTION)
+# -------------------------------------------------
+class RedisCrawlStateRepo:
+    def __init__(self):
+        import redis  # lazy import
+        self.client = redis.Redis(connection_pool=get_redis_pool())
+
+    def load(self, userId: str, source: str) -> Dict[str, Dict]:
+        raw = self.client.hgetall(_source_key(userId, source))
+        return {url: json.loads(v) for url, v in raw.items()}
+
+    def save(self, userId: str, source: str, state: Dict[str, Dict]):
+        key = _source_key(userId, source)
+        pipe = self.client.pipeline()   # MULTI: replace atomically
+        pipe.delete(key)
+        if state:
+            pipe.hset(
+                key,
+                mapping={url: json.dumps(v) for url, v in state.items()},
+            )
+            pipe.expire(key, CRAWL_STATE_TTL_SECONDS)
+        pipe.execute()
+
+
+# -------------------------------------------------
+# Factory
+# -------------------------------------------------
+def get_crawl_state_repo():
+    if USE_CELERY:
+        return RedisCrawlStateRepo()
+    return InMemoryCrawlStateRepo()
@@ -0,0 +1,213 @@
+# app/repos/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USE_CELERY = os.getenv("USE_CELERY", "true").lower() == "true"
+
+EMBED_CACHE_ENABLE = os.getenv("EMBED_CACHE_ENABLE", "true").lower() == "true"
+
+# 🔑 REDIS KEY PREFIX (CHANGE PER APP)
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "pinecone:")
+
+# ⏱️ ENTRY TTL (seconds) – default: 30 days, refreshed on hit
+EMBED_CACHE_TTL_SECONDS = int(
+    os.getenv("EMBED_CACHE_TTL_SECONDS", 60 * 60 * 24 * 30)
+)
+
+# Local store only (Redis relies on TTL + maxmemory-policy)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 200_000))
+
+
+def cache_key(model: str, text: str, dimensions: Optional[int] = None) -> str:
+    """
+    Vectors of the same model at another output size never collide.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if dimensions:
+        return f"{model}@{dimensions}:{digest}"
+    return f"{model}:{digest}"
+
+
+def _pack(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _unpack(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.float32)
+
+
+class EmbeddingCache:
+    """
+    Base: process-local hit/miss counters.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits: int, misses: int):
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# -------------------------------------------------
+# Local on-disk store (LOCAL DEV / non-Celery)
+# -------------------------------------------------
+class LocalEmbeddingCache(EmbeddingCache):
+    """
+    SQLite-backed cache with TTL + LRU eviction.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH):
+        super().__init__()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed"
+            " ON embeddings (accessed)"
+        )
+        self.db.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+        cutoff = now - EMBED_CACHE_TTL_SECONDS
+
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self.db.execute(
+                    f"SELECT key, vector FROM embeddings"
+                    f" WHERE key IN ({marks}) AND accessed >= ?",
+                    (*part, cutoff),
+                ).fetchall()
+                for key, raw in rows:
+                    found[key] = _unpack(raw)
+
+            if found:
+                self.db.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self.db.commit()
+
+        self.record(len(found), len(keys) - len(found))
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed)"
+                " VALUES (?, ?, ?)",
+                [(k, _pack(v), now) for k, v in items.items()],
+            )
+            self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now: float):
+        self.db.execute(
+            "DELETE FROM embeddings WHERE accessed < ?",
+            (now - EMBED_CACHE_TTL_SECONDS,),
+        )
+        (count,) = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - EMBED_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            )
+
+
+# -------------------------------------------------
+# Redis-backed cache (PRODUCTION)
+# -------------------------------------------------
+class RedisEmbeddingCache(EmbeddingCache):
+    """
+    Shared across workers. TTL is refreshed on every hit (GETEX), so
+    with an LRU maxmemory-policy cold entries are the first to go.
+    """
+
+    def __init__(self):
+        super().__init__()
+        import redis  # lazy import
+        redis_url = os.environ.get("REDIS_URL")
+        if not redis_url:
+            raise RuntimeError("REDIS_URL is required in production")
+
+        # Binary values → no decode_responses
+        self.client = redis.from_url(redis_url)
+
+    def _key(self, key: str) -> str:
+        return f"{REDIS_PREFIX}emb:{key}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+
+        pipe = self.client.pipeline(transaction=False)
+        for k in keys:
+            pipe.getex(self._key(k), ex=EMBED_CACHE_TTL_SECONDS)
+        raws = pipe.execute()
+
+        found = {k: _unpack(raw) for k, raw in zip(keys, raws) if raw}
+        hits, misses = len(found), len(keys) - len(found)
+        self.record(hits, misses)
+
+        # Global counters (all workers)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hincrby(f"{REDIS_PREFIX}emb:stats", "hits", hits)
+        pipe.hincrby(f"{REDIS_PREFIX}emb:stats", "misses", misses)
+        pipe.execute()
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for k, v in items.items():
+            pipe.set(self._key(k), _pack(v), ex=EMBED_CACHE_TTL_SECONDS)
+        pipe.execute()
+
+
+# -------------------------------------------------
+# Factory
+# -------------------------------------------------
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _CACHE
+    if not EMBED_CACHE_ENABLE:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = RedisEmbeddingCache() if USE_CELERY else LocalEmbeddingCache()
+        return _CACHE
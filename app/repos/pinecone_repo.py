@@ -1,10 +1,100 @@
 from pinecone import Pinecone
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import List, Dict, Optional
+import numpy as np
+from tenacity import (
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+from app.metrics import UPSERT_VECTORS, stage_timer
 
 load_dotenv()
 
+# Upsert tuning (Pinecone caps a request at 2 MB / 1000 vectors)
+UPSERT_MAX_BATCH_BYTES = int(os.getenv("UPSERT_MAX_BATCH_BYTES", 1_500_000))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", 4))
+UPSERT_MAX_ATTEMPTS = int(os.getenv("UPSERT_MAX_ATTEMPTS", 5))
+
+try:
+    from urllib3.exceptions import HTTPError as _TransportError
+except ImportError:   # newer clients don't go through urllib3
+    _TransportError = ConnectionError
+
+# JSON bytes per float32 value once widened to a Python float ("-0.0123…,")
+_FLOAT_JSON_BYTES = 22
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Worth retrying: connection errors, timeouts, 429 and 5xx. Other API
+    errors (dimension mismatch, metadata too large, auth) fail at once.
+    """
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return (
+        isinstance(exc, (ConnectionError, TimeoutError, _TransportError))
+        or type(exc).__name__ in ("PineconeConnectionError", "PineconeProtocolError")
+    )
+
+
+def to_values(values) -> List[float]:
+    """
+    float32 array → plain list, at the Pinecone boundary only.
+    """
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return values
+
+
+def vector_payload_bytes(vector: Dict) -> int:
+    """
+    Approximate serialized size of one vector in an upsert request.
+    """
+    values = vector.get("values")
+    if not isinstance(values, np.ndarray):
+        return len(json.dumps(vector, separators=(",", ":")))
+
+    rest = {k: v for k, v in vector.items() if k != "values"}
+    return (
+        len(json.dumps(rest, separators=(",", ":")))
+        + values.size * _FLOAT_JSON_BYTES
+    )
+
+
+def batch_by_payload(
+    vectors: List[Dict],
+    max_bytes: int = UPSERT_MAX_BATCH_BYTES,
+    max_items: int = 1000,
+) -> List[List[Dict]]:
+    """
+    Splits vectors into batches that stay under max_bytes / max_items.
+    A single oversized vector still gets its own batch.
+    """
+    batches: List[List[Dict]] = []
+    batch: List[Dict] = []
+    size = 0
+
+    for v in vectors:
+        n = vector_payload_bytes(v)
+        if batch and (size + n > max_bytes or len(batch) >= max_items):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(v)
+        size += n
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
 
 class PineconeRepo:
     """
@@ -15,6 +105,7 @@ class PineconeRepo:
     """
 
     def __init__(self):
+        self.pid = os.getpid()
         api_key = os.environ.get("PINECONE_API_KEY")
         host = os.environ.get("PINECONE_HOST")
 
@@ -33,21 +124,55 @@ class PineconeRepo:
         userId: str,
         vectors: List[Dict],
         batch_size: int = 100,
+        max_batch_bytes: int = UPSERT_MAX_BATCH_BYTES,
+        concurrency: int = UPSERT_CONCURRENCY,
     ):
         """
         Upserts vectors into a USER-scoped namespace.
         Namespace = userId ONLY.
+
+        - batches capped by serialized bytes and batch_size vectors
+        - up to `concurrency` requests in flight
+        - each batch retried with exponential backoff
         """
 
         if not vectors:
             return
 
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            self.index.upsert(
-                vectors=batch,
-                namespace=userId,
-            )
+        batches = batch_by_payload(
+            vectors,
+            max_bytes=max_batch_bytes,
+            max_items=batch_size,
+        )
+
+        if len(batches) == 1 or concurrency <= 1:
+            for batch in batches:
+                self._upsert_batch(userId, batch)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(self._upsert_batch, userId, batch)
+                for batch in batches
+            ]
+            for f in futures:
+                f.result()  # surface the first failure
+
+    def _upsert_batch(self, userId: str, batch: List[Dict]):
+        wire = [{**v, "values": to_values(v["values"])} for v in batch]
+
+        for attempt in Retrying(
+            stop=stop_after_attempt(UPSERT_MAX_ATTEMPTS),
+            wait=wait_exponential_jitter(initial=0.5, max=10),
+            retry=retry_if_exception(is_transient_error),
+            reraise=True,
+        ):
+            with attempt, stage_timer("upsert"):
+                self.index.upsert(
+                    vectors=wire,
+                    namespace=userId,
+                )
+        UPSERT_VECTORS.inc(len(batch))
 
     # --------------------------------------------------
     # Query (USER namespace only)
@@ -56,7 +181,7 @@ class PineconeRepo:
         self,
         *,
         userId: str,
-        vector: List[float],
+        vector,
         top_k: int = 6,
         metadata_filter: Optional[Dict] = None,
     ):
@@ -65,13 +190,27 @@ class PineconeRepo:
         """
 
         return self.index.query(
-            vector=vector,
+            vector=to_values(vector),
             top_k=top_k,
             namespace=userId,
             filter=metadata_filter,
             include_metadata=True,
         )
 
+    # --------------------------------------------------
+    # Delete specific vectors (USER namespace only)
+    # --------------------------------------------------
+    def delete_ids(self, *, userId: str, ids: List[str], batch_size: int = 1000):
+        """
+        Deletes vectors by id within USER namespace.
+        """
+
+        for i in range(0, len(ids), batch_size):
+            self.index.delete(
+                ids=ids[i:i + batch_size],
+                namespace=userId,
+            )
+
     # --------------------------------------------------
     # Delete ALL data for a user
     # --------------------------------------------------
@@ -94,3 +233,20 @@ class PineconeRepo:
             return True
         except Exception:
             return False
+
+
+# --------------------------------------------------
+# Shared instance (one client per process)
+# --------------------------------------------------
+_REPO: Optional[PineconeRepo] = None
+_REPO_LOCK = threading.Lock()
+
+
+def get_pinecone_repo() -> PineconeRepo:
+    global _REPO
+    with _REPO_LOCK:
+        # Fresh client after fork (Celery prefork children): the
+        # parent's connection pool must not be shared
+        if _REPO is None or _REPO.pid != os.getpid():
+            _REPO = PineconeRepo()
+        return _REPO
@@ -1,8 +1,13 @@
 # app/repos/redis_jobs.py
+import asyncio
 import json
 import uuid
 import os
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,105 +20,347 @@ REDIS_PREFIX = os.getenv("REDIS_PREFIX", "pinecone:")
 # ⏱️ JOB TTL (seconds) – default: 24 hours
 JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", 60 * 60 * 24))
 
+# 🐢 Min seconds between progress writes within the same stage
+JOB_PROGRESS_MIN_INTERVAL = float(os.getenv("JOB_PROGRESS_MIN_INTERVAL", 1.0))
+
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+
+# 💓 SSE keep-alive interval (seconds)
+JOB_EVENTS_HEARTBEAT_SEC = float(os.getenv("JOB_EVENTS_HEARTBEAT_SEC", 15))
+
+TERMINAL_STATUSES = ("done", "failed", "not_found")
+
+
+def _new_job(sourceId: str) -> Dict:
+    return {
+        "jobId": f"job_{uuid.uuid4().hex[:8]}",
+        "sourceId": sourceId,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0,
+        "createdAt": datetime.utcnow().isoformat(),
+    }
+
+
+class _JobRepoBase:
+    """
+    Shared job lifecycle on top of create / update / get.
+
+    `progress()` coalesces writes: a stage change is written at once,
+    progress within a stage at most every JOB_PROGRESS_MIN_INTERVAL sec.
+    """
+
+    def __init__(self):
+        self._last_progress: Dict[str, tuple] = {}   # jobId → (stage, ts)
+        self._progress_lock = threading.Lock()
+
+    def progress(self, jobId, progress: int, stage: Optional[str] = None):
+        now = time.monotonic()
+        with self._progress_lock:
+            last_stage, last_ts = self._last_progress.get(jobId, (None, 0.0))
+            if stage == last_stage and now - last_ts < JOB_PROGRESS_MIN_INTERVAL:
+                return
+            self._last_progress[jobId] = (stage, now)
+
+        fields = {"progress": progress}
+        if stage is not None:
+            fields["stage"] = stage
+        self.update(jobId, **fields)
+
+    def complete(self, jobId, **kwargs):
+        self._last_progress.pop(jobId, None)
+        self.update(jobId, status="done", progress=100, stage="done", **kwargs)
+
+    def fail(self, jobId, error):
+        self._last_progress.pop(jobId, None)
+        self.update(jobId, status="failed", error=error)
+
+    async def events(self, jobId) -> AsyncIterator[Optional[Dict]]:
+        """
+        Yields the job snapshot, then a fresh snapshot on every update,
+        until the job is done / failed / not found.
+        Yields None when nothing happened for JOB_EVENTS_HEARTBEAT_SEC.
+        """
+        async with self._subscribe(jobId) as next_fields:
+            # Subscribed BEFORE the first read → no update is missed
+            snapshot = await self._aget(jobId)
+            yield snapshot
+
+            while snapshot.get("status") not in TERMINAL_STATUSES:
+                fields = await next_fields(JOB_EVENTS_HEARTBEAT_SEC)
+                if fields is None:
+                    yield None
+                    continue
+                snapshot = {**snapshot, **fields}
+                yield snapshot
+
+
 # -------------------------------------------------
 # In-memory fallback (LOCAL DEV)
 # -------------------------------------------------
 _IN_MEMORY_JOBS = {}
 
+# In-process notifier: job key → [(event loop, queue)]
+_SUBSCRIBERS: Dict[str, list] = {}
+_SUBSCRIBERS_LOCK = threading.Lock()
+
+
+def _notify(key: str, fields: Dict):
+    with _SUBSCRIBERS_LOCK:
+        subscribers = list(_SUBSCRIBERS.get(key, ()))
+    for loop, queue in subscribers:
+        loop.call_soon_threadsafe(queue.put_nowait, dict(fields))
+
 
-class InMemoryJobRepo:
+class InMemoryJobRepo(_JobRepoBase):
     def _key(self, jobId: str) -> str:
         return f"{REDIS_PREFIX}{jobId}"
 
     def create(self, sourceId: str):
-        jobId = f"job_{uuid.uuid4().hex[:8]}"
-        data = {
-            "jobId": jobId,
-            "sourceId": sourceId,
-            "status": "queued",
-            "stage": "queued",
-            "progress": 0,
-            "createdAt": datetime.utcnow().isoformat(),
-        }
-        _IN_MEMORY_JOBS[self._key(jobId)] = data
-        return data
+        data = _new_job(sourceId)
+        _IN_MEMORY_JOBS[self._key(data["jobId"])] = data
+        return dict(data)
+
+    def create_many(self, sourceIds: List[str]) -> List[Dict]:
+        return [self.create(s) for s in sourceIds]
 
     def update(self, jobId, **kwargs):
         key = self._key(jobId)
         if key in _IN_MEMORY_JOBS:
             _IN_MEMORY_JOBS[key].update(kwargs)
+            _notify(key, kwargs)
 
-    def complete(self, jobId):
-        self.update(jobId, status="done", progress=100, stage="done")
-
-    def fail(self, jobId, error):
-        self.update(jobId, status="failed", error=error)
+    def incr(self, jobId, field: str, amount: int = 1) -> Optional[int]:
+        key = self._key(jobId)
+        with _SUBSCRIBERS_LOCK:
+            if key not in _IN_MEMORY_JOBS:
+                return None
+            value = _IN_MEMORY_JOBS[key].get(field, 0) + amount
+            _IN_MEMORY_JOBS[key][field] = value
+        _notify(key, {field: value})
+        return value
 
     def get(self, jobId):
-        return _IN_MEMORY_JOBS.get(self._key(jobId), {
+        data = _IN_MEMORY_JOBS.get(self._key(jobId))
+        return dict(data) if data else {
             "jobId": jobId,
             "status": "not_found"
-        })
+        }
+
+    def get_many(self, jobIds: List[str]) -> List[Dict]:
+        return [self.get(j) for j in jobIds]
+
+    async def _aget(self, jobId):
+        return self.get(jobId)
+
+    @asynccontextmanager
+    async def _subscribe(self, jobId):
+        key = self._key(jobId)
+        sub = (asyncio.get_running_loop(), asyncio.Queue())
+        with _SUBSCRIBERS_LOCK:
+            _SUBSCRIBERS.setdefault(key, []).append(sub)
+
+        async def next_fields(timeout: float) -> Optional[Dict]:
+            try:
+                return await asyncio.wait_for(sub[1].get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            yield next_fields
+        finally:
+            with _SUBSCRIBERS_LOCK:
+                _SUBSCRIBERS[key].remove(sub)
+                if not _SUBSCRIBERS[key]:
+                    del _SUBSCRIBERS[key]
 
 
 # -------------------------------------------------
 # Redis-backed repo (PRODUCTION)
 # -------------------------------------------------
-class RedisJobRepo:
+# HSET + EXPIRE only if the job still exists (no resurrecting expired
+# jobs with partial fields) → atomic, one round trip.
+# The changed fields are PUBLISHed for SSE subscribers (KEYS[2]).
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[2], cjson.encode(ARGV))
+return 1
+"""
+
+# Atomic counter (fan-out subtasks report into the parent job)
+_INCR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local value = redis.call('HINCRBY', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[2], cjson.encode({ARGV[1], ARGV[2], tostring(value)}))
+return value
+"""
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_ASYNC_CLIENT = None
+
+
+def get_redis_pool():
+    """
+    Process-wide connection pool shared by every Redis-backed repo.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            import redis  # lazy import
+            redis_url = os.environ.get("REDIS_URL")
+            if not redis_url:
+                raise RuntimeError("REDIS_URL is required in production")
+            _POOL = redis.ConnectionPool.from_url(
+                redis_url,
+                decode_responses=True,
+                max_connections=REDIS_MAX_CONNECTIONS,
+            )
+        return _POOL
+
+
+def get_async_redis():
+    """
+    asyncio client for the API event loop (SSE subscriptions).
+    """
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        import redis.asyncio  # lazy import
+        _ASYNC_CLIENT = redis.asyncio.Redis.from_url(
+            os.environ["REDIS_URL"],
+            decode_responses=True,
+            max_connections=REDIS_MAX_CONNECTIONS,
+        )
+    return _ASYNC_CLIENT
+
+
+def _decode(raw: Dict[str, str]) -> Dict:
+    return {k: json.loads(v) for k, v in raw.items()}
+
+
+class RedisJobRepo(_JobRepoBase):
+    """
+    One Redis hash per job, each field JSON-encoded.
+    """
+
     def __init__(self):
+        super().__init__()
         import redis  # lazy import
-        redis_url = os.environ.get("REDIS_URL")
-        if not redis_url:
-            raise RuntimeError("REDIS_URL is required in production")
-
-        self.client = redis.from_url(redis_url, decode_responses=True)
+        self.client = redis.Redis(connection_pool=get_redis_pool())
+        self._update = self.client.register_script(_UPDATE_SCRIPT)
+        self._incr = self.client.register_script(_INCR_SCRIPT)
 
     def _key(self, jobId: str) -> str:
-        return f"{REDIS_PREFIX}{jobId}"
+        return f"{REDIS_PREFIX}job:{jobId}"
+
+    def _channel(self, jobId: str) -> str:
+        return f"{REDIS_PREFIX}job:{jobId}:events"
 
     def create(self, sourceId: str):
-        jobId = f"job_{uuid.uuid4().hex[:8]}"
-        data = {
-            "jobId": jobId,
-            "sourceId": sourceId,
-            "status": "queued",
-            "stage": "queued",
-            "progress": 0,
-            "createdAt": datetime.utcnow().isoformat(),
-        }
-        key = self._key(jobId)
-        self.client.set(key, json.dumps(data), ex=JOB_TTL_SECONDS)
+        data = _new_job(sourceId)
+        key = self._key(data["jobId"])
+
+        pipe = self.client.pipeline()   # MULTI/EXEC
+        pipe.hset(key, mapping={k: json.dumps(v) for k, v in data.items()})
+        pipe.expire(key, JOB_TTL_SECONDS)
+        pipe.execute()
         return data
 
+    def create_many(self, sourceIds: List[str]) -> List[Dict]:
+        """
+        Creates all jobs in one round trip.
+        """
+        created = [_new_job(s) for s in sourceIds]
+
+        pipe = self.client.pipeline()
+        for data in created:
+            key = self._key(data["jobId"])
+            pipe.hset(key, mapping={k: json.dumps(v) for k, v in data.items()})
+            pipe.expire(key, JOB_TTL_SECONDS)
+        pipe.execute()
+        return created
+
     def update(self, jobId, **kwargs):
-        key = self._key(jobId)
-        raw = self.client.get(key)
-        if not raw:
+        if not kwargs:
             return
-        data = json.loads(raw)
-        data.update(kwargs)
+        args = [JOB_TTL_SECONDS]
+        for k, v in kwargs.items():
+            args.extend((k, json.dumps(v)))
 
         # 🔄 Refresh TTL on update
-        self.client.set(key, json.dumps(data), ex=JOB_TTL_SECONDS)
+        self._update(keys=[self._key(jobId), self._channel(jobId)], args=args)
 
-    def complete(self, jobId):
-        self.update(jobId, status="done", progress=100, stage="done")
-
-    def fail(self, jobId, error):
-        self.update(jobId, status="failed", error=error)
+    def incr(self, jobId, field: str, amount: int = 1) -> Optional[int]:
+        return self._incr(
+            keys=[self._key(jobId), self._channel(jobId)],
+            args=[JOB_TTL_SECONDS, field, amount],
+        )
 
     def get(self, jobId):
-        raw = self.client.get(self._key(jobId))
-        return json.loads(raw) if raw else {
+        raw = self.client.hgetall(self._key(jobId))
+        return _decode(raw) if raw else {
+            "jobId": jobId,
+            "status": "not_found"
+        }
+
+    def get_many(self, jobIds: List[str]) -> List[Dict]:
+        pipe = self.client.pipeline(transaction=False)
+        for jobId in jobIds:
+            pipe.hgetall(self._key(jobId))
+        return [
+            _decode(raw) if raw else {"jobId": jobId, "status": "not_found"}
+            for jobId, raw in zip(jobIds, pipe.execute())
+        ]
+
+    async def _aget(self, jobId):
+        raw = await get_async_redis().hgetall(self._key(jobId))
+        return _decode(raw) if raw else {
             "jobId": jobId,
             "status": "not_found"
         }
 
+    @asynccontextmanager
+    async def _subscribe(self, jobId):
+        pubsub = get_async_redis().pubsub()
+        await pubsub.subscribe(self._channel(jobId))
+
+        async def next_fields(timeout: float) -> Optional[Dict]:
+            msg = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=timeout,
+            )
+            if msg is None:
+                return None
+            args = json.loads(msg["data"])   # [ttl, k1, v1, k2, v2, ...]
+            return {
+                k: json.loads(v)
+                for k, v in zip(args[1::2], args[2::2])
+            }
+
+        try:
+            yield next_fields
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
 
 # -------------------------------------------------
-# Factory
+# Factory (one repo per process)
 # -------------------------------------------------
+_REPO = None
+_REPO_LOCK = threading.Lock()
+
+
 def get_job_repo():
-    if USE_CELERY:
-        return RedisJobRepo()
-    return InMemoryJobRepo()
+    global _REPO
+    with _REPO_LOCK:
+        if _REPO is None:
+            _REPO = RedisJobRepo() if USE_CELERY else InMemoryJobRepo()
+        return _REPO
@@ -1,7 +1,19 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from app.repos.redis_jobs import get_job_repo
+from app.repos.blob_store import BlobTooLarge, get_blob_store
 from app.workers.ingest_task import ingest_document
-from app.schemas.ingest import IngestRequest
+from app.workers.batch_task import dispatch_batch
+from app.schemas.ingest import IngestBatchRequest, IngestRequest
+from app.schemas.query import (
+    QueryBatchRequest,
+    QueryBatchResponse,
+    QueryRequest,
+    QueryResponse,
+)
+from app.services.retrieval import build_filter, search
+import json
 import os
 from uuid import uuid4
 
@@ -33,12 +45,14 @@ def ingest(req: IngestRequest):
             jobId=job["jobId"],
             userId=req.userId,
             source=source,
+            incremental=req.incremental,
         )
     else:
         ingest_document(
             jobId=job["jobId"],
             userId=req.userId,
             source=source,
+            incremental=req.incremental,
         )
 
     return {
@@ -47,6 +61,22 @@ def ingest(req: IngestRequest):
     }
 
 
+# --------------------------------------------------
+# Ingest many URLs (one parent job, one child per source)
+# --------------------------------------------------
+@router.post("/ingest/batch", status_code=202)
+def ingest_batch(req: IngestBatchRequest):
+    try:
+        return dispatch_batch(
+            userId=req.userId,
+            sources=req.sources,
+            incremental=req.incremental,
+            use_celery=USE_CELERY,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # --------------------------------------------------
 # Ingest PDF (Direct Upload)
 # --------------------------------------------------
@@ -61,22 +91,26 @@ async def ingest_pdf(
             detail="Only PDF files are allowed"
         )
 
-    job = jobs.create(userId)
+    # Stream upload → blob store (bytes never go through the broker)
+    try:
+        blob_ref = await run_in_threadpool(get_blob_store().put_file, file.file)
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    pdf_bytes = await file.read()
+    job = jobs.create(userId)
 
     # ALWAYS use keyword arguments
     if USE_CELERY:
         ingest_document.delay(
             jobId=job["jobId"],
             userId=userId,
-            source=pdf_bytes,  # BYTES
+            blobRef=blob_ref,
         )
     else:
         ingest_document(
             jobId=job["jobId"],
             userId=userId,
-            source=pdf_bytes,  # BYTES
+            blobRef=blob_ref,
         )
 
     return {
@@ -85,6 +119,59 @@ async def ingest_pdf(
     }
 
 
+# --------------------------------------------------
+# Retrieval
+# --------------------------------------------------
+def _filter(req):
+    f = req.filter
+    if f is None:
+        return None
+    return build_filter(sourceType=f.sourceType, url=f.url, page=f.page)
+
+
+@router.post("/query", response_model=QueryResponse)
+def query(req: QueryRequest):
+    question = req.question.strip()
+    if not question:
+        raise HTTPException(
+            status_code=400,
+            detail="question must be a non-empty string"
+        )
+
+    [matches] = search(
+        userId=req.userId,
+        questions=[question],
+        top_k=req.topK,
+        metadata_filter=_filter(req),
+    )
+
+    return {"question": question, "matches": matches}
+
+
+@router.post("/query/batch", response_model=QueryBatchResponse)
+def query_batch(req: QueryBatchRequest):
+    questions = [q.strip() for q in req.questions]
+    if not all(questions):
+        raise HTTPException(
+            status_code=400,
+            detail="questions must be non-empty strings"
+        )
+
+    results = search(
+        userId=req.userId,
+        questions=questions,
+        top_k=req.topK,
+        metadata_filter=_filter(req),
+    )
+
+    return {
+        "results": [
+            {"question": q, "matches": m}
+            for q, m in zip(questions, results)
+        ]
+    }
+
+
 # --------------------------------------------------
 # Job Status
 # --------------------------------------------------
@@ -95,4 +182,55 @@ def job_status(jobId: str):
     if data["status"] == "not_found":
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return data
\ No newline at end of file
+    # Batch parent → attach live child status
+    children = data.get("children")
+    if children:
+        states = jobs.get_many([c["jobId"] for c in children])
+        data["children"] = [
+            {
+                **c,
+                "status": st["status"],
+                "progress": st.get("progress"),
+                "error": st.get("error"),
+            }
+            for c, st in zip(children, states)
+        ]
+
+    return data
+
+
+# --------------------------------------------------
+# Job Progress (Server-Sent Events)
+# --------------------------------------------------
+def _sse(data: dict) -> str:
+    event = data["status"] if data["status"] in ("done", "failed") else "progress"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/jobs/{jobId}/events")
+async def job_events(jobId: str, request: Request):
+    stream = jobs.events(jobId)
+    first = await stream.__anext__()
+
+    if first["status"] == "not_found":
+        await stream.aclose()
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def body():
+        try:
+            yield _sse(first)
+            async for data in stream:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n" if data is None else _sse(data)
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
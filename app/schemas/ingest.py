@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import List
 
 
 class IngestRequest(BaseModel):
@@ -25,6 +26,41 @@ class IngestRequest(BaseModel):
         description="Website URL to scrape and ingest"
     )
 
+    incremental: bool = Field(
+        False,
+        description=(
+            "Re-crawl using stored ETag/Last-Modified/sitemap lastmod and "
+            "text hashes: only changed pages are re-embedded and vectors "
+            "of removed pages are deleted"
+        )
+    )
+
+
+class IngestBatchRequest(BaseModel):
+    """
+    Many website URLs in one request.
+
+    Used by:
+    - POST /ingest/batch
+
+    Sources are canonicalized and deduplicated; each one gets a child
+    job under a single parent job.
+    """
+
+    userId: str = Field(
+        ...,
+        description="Authenticated user ID (used as Pinecone namespace)"
+    )
+
+    sources: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=200,
+        description="Website URLs to scrape and ingest"
+    )
+
+    incremental: bool = False
+
 
 class IngestResponse(BaseModel):
     """
@@ -0,0 +1,63 @@
+# app/schemas/query.py
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class QueryFilter(BaseModel):
+    """
+    Optional metadata filters (all combined with AND).
+    """
+
+    sourceType: Optional[str] = Field(None, description='"pdf" | "web"')
+    url: Optional[str] = None
+    page: Optional[int] = None
+
+
+class QueryRequest(BaseModel):
+    """
+    Used by:
+    - POST /query
+    """
+
+    userId: str = Field(
+        ...,
+        description="Authenticated user ID (Pinecone namespace)"
+    )
+    question: str
+    topK: int = Field(6, ge=1, le=50)
+    filter: Optional[QueryFilter] = None
+
+
+class QueryBatchRequest(BaseModel):
+    """
+    Used by:
+    - POST /query/batch
+
+    All questions are embedded in ONE call and queried concurrently.
+    """
+
+    userId: str = Field(
+        ...,
+        description="Authenticated user ID (Pinecone namespace)"
+    )
+    questions: List[str] = Field(..., min_length=1, max_length=32)
+    topK: int = Field(6, ge=1, le=50)
+    filter: Optional[QueryFilter] = None
+
+
+class QueryMatch(BaseModel):
+    id: str
+    score: float
+    text: Optional[str] = None
+    sourceType: Optional[str] = None
+    url: Optional[str] = None
+    page: Optional[int] = None
+
+
+class QueryResponse(BaseModel):
+    question: str
+    matches: List[QueryMatch]
+
+
+class QueryBatchResponse(BaseModel):
+    results: List[QueryResponse]
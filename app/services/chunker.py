@@ -0,0 +1,134 @@
+# app/services/chunker.py
+import os
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Iterator, List, NamedTuple, Tuple
+
+# Chunk budget in model tokens (≈ the old 1600 / 200 character splitter)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 400))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 50))
+
+# Cut at a newline / sentence end if one is in the last 10% of the window
+CHUNK_BOUNDARY_SLACK = float(os.getenv("CHUNK_BOUNDARY_SLACK", 0.1))
+
+SOURCE_SEPARATOR = "\n\n"
+
+_SENTENCE_ENDS = (b".", b"!", b"?", b";", b":")
+
+
+class Chunk(NamedTuple):
+    text: str
+    source: int       # index of the text the chunk starts in
+    source_end: int   # index of the text the chunk ends in
+    tokens: int
+
+
+class TokenChunker:
+    """
+    Token-budgeted chunking on a tiktoken encoding.
+
+    Texts are encoded once and every chunk boundary maps to a byte
+    offset. An offset index of where each source text starts then
+    attributes a chunk to its page / URL with one bisection.
+    """
+
+    def __init__(
+        self,
+        encoding,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        boundary_slack: float = CHUNK_BOUNDARY_SLACK,
+    ):
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be in [0, chunk_tokens)")
+
+        self.encoding = encoding
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_cut = max(
+            overlap_tokens + 1,
+            int(chunk_tokens * (1 - boundary_slack)),
+        )
+
+    # --------------------------------------------------
+    # Windows over one token sequence
+    # --------------------------------------------------
+    def _cut(self, tokens: List[int], start: int, end: int) -> int:
+        """
+        Latest newline / sentence end in the window's slack, else `end`.
+        """
+        lo = start + self.min_cut
+        tail = self.encoding.decode_bytes(tokens[lo - 1:end])
+        if b"\n" not in tail and not any(p in tail for p in _SENTENCE_ENDS):
+            return end
+
+        token_bytes = self.encoding.decode_single_token_bytes
+        for j in range(end, lo - 1, -1):
+            b = token_bytes(tokens[j - 1])
+            if b"\n" in b or b.rstrip().endswith(_SENTENCE_ENDS):
+                return j
+        return end
+
+    def _chunks(self, tokens: List[int]) -> Iterator[Tuple[str, int, int, int]]:
+        """
+        (text, byte start, byte end, token count) per window.
+
+        Byte offsets are tracked from the decoded windows themselves,
+        so no per-token work happens in Python.
+        """
+        decode = self.encoding.decode_bytes
+        n = len(tokens)
+        start = 0
+        offset = 0   # byte offset of tokens[start]
+
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                end = self._cut(tokens, start, end)
+
+            raw = decode(tokens[start:end])
+            body = raw.strip()
+            if body:
+                a = offset + len(raw) - len(raw.lstrip())
+                yield body.decode("utf-8", "ignore"), a, a + len(body), end - start
+
+            if end == n:
+                return
+            nxt = max(end - self.overlap_tokens, start + 1)
+            offset += len(raw) - len(decode(tokens[nxt:end]))
+            start = nxt
+
+    # --------------------------------------------------
+    # Public
+    # --------------------------------------------------
+    def chunk(self, texts: List[str], join: bool = True) -> List[Chunk]:
+        """
+        join=True:  texts are one document (PDF pages) → chunks may span
+                    sources; source / source_end say which.
+        join=False: every text is chunked on its own (web pages).
+        """
+        if not join:
+            out: List[Chunk] = []
+            for i, text in enumerate(texts):
+                tokens = self.encoding.encode_ordinary(text)
+                for chunk, _, _, n in self._chunks(tokens):
+                    out.append(Chunk(chunk, i, i, n))
+            return out
+
+        sep = len(SOURCE_SEPARATOR.encode("utf-8"))
+        starts = list(accumulate(
+            (len(t.encode("utf-8")) + sep for t in texts[:-1]),
+            initial=0,
+        ))
+
+        tokens = self.encoding.encode_ordinary(SOURCE_SEPARATOR.join(texts))
+
+        return [
+            Chunk(
+                chunk,
+                bisect_right(starts, a) - 1,
+                bisect_right(starts, b - 1) - 1,
+                n,
+            )
+            for chunk, a, b, n in self._chunks(tokens)
+        ]
@@ -0,0 +1,216 @@
+# app/services/dedup.py
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.metrics import DEDUP_DROPPED, DEDUP_TOKENS
+
+DEDUP_ENABLE = os.getenv("DEDUP_ENABLE", "true").lower() == "true"
+
+# 64-bit SimHash distance that still counts as a near-duplicate
+# (the band index below finds every match up to 3)
+DEDUP_SIMHASH_DISTANCE = int(os.getenv("DEDUP_SIMHASH_DISTANCE", 3))
+
+# A sentence on at least this many pages (and this share of the crawl)
+# is boilerplate: cookie banners, CTAs, footer text
+DEDUP_BOILERPLATE_MIN_PAGES = int(os.getenv("DEDUP_BOILERPLATE_MIN_PAGES", 3))
+DEDUP_BOILERPLATE_RATIO = float(os.getenv("DEDUP_BOILERPLATE_RATIO", 0.3))
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_SHINGLE = 3
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_END.split(text or "") if s]
+
+
+def fingerprint(text: str) -> str:
+    """
+    Exact-duplicate key; case, punctuation and spacing are ignored.
+    """
+    return hashlib.sha1(" ".join(_words(text)).encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word 3-shingles (words for very short text).
+    """
+    words = _words(text)
+    if len(words) >= _SHINGLE:
+        features = [
+            " ".join(words[i:i + _SHINGLE])
+            for i in range(len(words) - _SHINGLE + 1)
+        ]
+    else:
+        features = words
+    if not features:
+        return 0
+
+    digests = b"".join(
+        hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest()
+        for f in features
+    )
+    bits = np.unpackbits(
+        np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8),
+        axis=1,
+        bitorder="little",
+    )
+    majority = bits.sum(axis=0) * 2 > len(features)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+class SimHashIndex:
+    """
+    Near-duplicate lookup: hashes split into 4 bands of 16 bits; two
+    hashes within distance 3 share at least one band exactly.
+    """
+
+    def __init__(self, distance: int = DEDUP_SIMHASH_DISTANCE):
+        self.distance = distance
+        self.bands: List[Dict[int, List]] = [{} for _ in range(_BANDS)]
+
+    def _band_keys(self, h: int) -> List[int]:
+        mask = (1 << _BAND_BITS) - 1
+        return [(h >> (_BAND_BITS * i)) & mask for i in range(_BANDS)]
+
+    def find(self, h: int) -> Optional[str]:
+        for band, key in zip(self.bands, self._band_keys(h)):
+            for other, owner in band.get(key, ()):
+                if bin(h ^ other).count("1") <= self.distance:
+                    return owner
+        return None
+
+    def add(self, h: int, owner: str):
+        for band, key in zip(self.bands, self._band_keys(h)):
+            band.setdefault(key, []).append((h, owner))
+
+
+class JobDeduper:
+    """
+    Per-job dedup between crawling and embedding:
+
+    - boilerplate: sentences repeated across many pages are removed
+    - pages: exact (normalized text) and near (SimHash) duplicates of an
+      earlier page are dropped, e.g. /about and /about-us
+    - chunks: exact and near duplicates of an earlier chunk are dropped
+
+    `saved` counts what was not embedded (tokens across all three).
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        self.count_tokens = count_tokens
+        self.page_hashes: Dict[str, str] = {}   # fingerprint → url
+        self.page_index = SimHashIndex()
+        self.chunk_hashes: Set[str] = set()
+        self.chunk_index = SimHashIndex()
+        self.sentence_pages: Counter = Counter()   # streaming boilerplate
+        self.saved = {"pages": 0, "chunks": 0, "sentences": 0, "tokens": 0}
+        self._lock = threading.Lock()   # pipeline: pages / chunks in 2 threads
+
+    def _drop(self, kind: str, text: str, n: int = 1, tokens: Optional[int] = None):
+        tokens = self.count_tokens(text) if tokens is None else tokens
+        with self._lock:
+            self.saved[kind] += n
+            self.saved["tokens"] += tokens
+        DEDUP_DROPPED.labels(kind=kind).inc(n)
+        DEDUP_TOKENS.inc(tokens)
+
+    # --------------------------------------------------
+    # Boilerplate
+    # --------------------------------------------------
+    def _strip(self, text: str, boilerplate: Set[str]) -> str:
+        kept, removed = [], []
+        for s in split_sentences(text):
+            (removed if fingerprint(s) in boilerplate else kept).append(s)
+        if removed:
+            self._drop("sentences", " ".join(removed), n=len(removed))
+        return " ".join(kept)
+
+    def _sentence_set(self, text: str) -> Set[str]:
+        return {fingerprint(s) for s in split_sentences(text)}
+
+    # --------------------------------------------------
+    # Pages
+    # --------------------------------------------------
+    def _unique_page(self, page: Dict, text: str) -> Optional[Dict]:
+        if not text.strip():
+            return {**page, "text": ""}
+
+        url = page.get("url", "")
+        fp = fingerprint(text)
+        h = simhash(text)
+        original = self.page_hashes.get(fp) or self.page_index.find(h)
+        if original is not None:
+            print(f"♻️ Duplicate page {url} → {original}")
+            self._drop("pages", text)
+            return None
+
+        self.page_hashes[fp] = url
+        self.page_index.add(h, url)
+        return {**page, "text": text}
+
+    def filter_pages(self, pages: List[Dict]) -> List[Dict]:
+        """
+        Whole crawl at once: boilerplate is counted over every page first.
+        """
+        texts = [p["text"] for p in pages if p.get("text")]
+        counts = Counter()
+        for text in texts:
+            counts.update(self._sentence_set(text))
+        need = max(
+            DEDUP_BOILERPLATE_MIN_PAGES,
+            math.ceil(DEDUP_BOILERPLATE_RATIO * len(texts)),
+        )
+        boilerplate = {fp for fp, n in counts.items() if n >= need}
+
+        kept = []
+        for page in pages:
+            if not page.get("text"):
+                kept.append(page)
+                continue
+            page = self._unique_page(page, self._strip(page["text"], boilerplate))
+            if page is not None:
+                kept.append(page)
+        return kept
+
+    def filter_page(self, page: Dict) -> Optional[Dict]:
+        """
+        Streaming: a sentence is boilerplate once it was seen on
+        DEDUP_BOILERPLATE_MIN_PAGES earlier pages.
+        """
+        if not page.get("text"):
+            return page
+        sentences = self._sentence_set(page["text"])
+        boilerplate = {
+            fp for fp in sentences
+            if self.sentence_pages[fp] >= DEDUP_BOILERPLATE_MIN_PAGES
+        }
+        self.sentence_pages.update(sentences)
+        return self._unique_page(page, self._strip(page["text"], boilerplate))
+
+    # --------------------------------------------------
+    # Chunks
+    # --------------------------------------------------
+    def keep_chunk(self, text: str, tokens: Optional[int] = None) -> bool:
+        fp = fingerprint(text)
+        h = simhash(text)
+        if fp in self.chunk_hashes or self.chunk_index.find(h) is not None:
+            self._drop("chunks", text, tokens=tokens)
+            return False
+
+        self.chunk_hashes.add(fp)
+        self.chunk_index.add(h, fp)
+        return True
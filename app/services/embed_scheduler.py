@@ -0,0 +1,406 @@
+# app/services/embed_scheduler.py
+import asyncio
+import atexit
+import base64
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import openai
+
+from app.metrics import EMBED_THROTTLED, stage_timer
+
+USE_CELERY = os.getenv("USE_CELERY", "true").lower() == "true"
+
+# Account limits for the embedding model (requests / tokens per minute)
+EMBED_RPM_LIMIT = int(os.getenv("EMBED_RPM_LIMIT", 3_000))
+EMBED_TPM_LIMIT = int(os.getenv("EMBED_TPM_LIMIT", 1_000_000))
+# Bucket size, in seconds of quota (how much may go out in one burst)
+EMBED_BURST_SEC = float(os.getenv("EMBED_BURST_SEC", 10))
+
+# local → per process | redis → one budget shared by every worker
+EMBED_RATE_LIMITER = os.getenv(
+    "EMBED_RATE_LIMITER", "redis" if USE_CELERY else "local"
+)
+
+# Requests in flight per process (adapts between min and max)
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", 8))
+EMBED_MIN_CONCURRENCY = int(os.getenv("EMBED_MIN_CONCURRENCY", 1))
+# ...and per embed call, so one big job cannot take every slot
+EMBED_CALL_MAX_INFLIGHT = int(os.getenv("EMBED_CALL_MAX_INFLIGHT", 4))
+
+EMBED_MAX_ATTEMPTS = int(os.getenv("EMBED_MAX_ATTEMPTS", 8))
+EMBED_REQUEST_TIMEOUT = float(os.getenv("EMBED_REQUEST_TIMEOUT", 60))
+
+_RETRYABLE = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    retry-after-ms, or retry-after as seconds / HTTP date.
+    """
+    if not headers:
+        return None
+
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# -------------------------------------------------
+# Token buckets (requests + tokens)
+# -------------------------------------------------
+class LocalRateLimiter:
+    """
+    Two token buckets in this process. `reserve(tokens)` takes one
+    request + `tokens` tokens, or nothing and returns seconds to wait.
+    """
+
+    def __init__(
+        self,
+        rpm: int = EMBED_RPM_LIMIT,
+        tpm: int = EMBED_TPM_LIMIT,
+        burst_sec: float = EMBED_BURST_SEC,
+    ):
+        self.rates = (rpm / 60, tpm / 60)
+        self.caps = (
+            max(1.0, self.rates[0] * burst_sec),
+            max(1.0, self.rates[1] * burst_sec),
+        )
+        self.levels = list(self.caps)
+        self.ts = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            elapsed = now - self.ts
+            self.ts = now
+            self.levels = [
+                min(cap, lvl + elapsed * rate)
+                for lvl, cap, rate in zip(self.levels, self.caps, self.rates)
+            ]
+
+            need = (1, min(tokens, self.caps[1]))
+            wait = max(
+                (n - lvl) / rate if lvl < n else 0.0
+                for n, lvl, rate in zip(need, self.levels, self.rates)
+            )
+            if wait > 0:
+                return wait
+
+            self.levels = [lvl - n for lvl, n in zip(self.levels, need)]
+            return 0.0
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# Both buckets + the 429 pause in one hash, updated atomically.
+# ARGV: now_ms, req_rate/ms, req_cap, tok_rate/ms, tok_cap, tokens, ttl_ms
+_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local h = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts', 'paused_until')
+
+local paused = tonumber(h[4]) or 0
+if paused > now then
+    return paused - now
+end
+
+local rr, rc = tonumber(ARGV[2]), tonumber(ARGV[3])
+local tr, tc = tonumber(ARGV[4]), tonumber(ARGV[5])
+local ts = tonumber(h[3]) or now
+local req = math.min(rc, (tonumber(h[1]) or rc) + (now - ts) * rr)
+local tok = math.min(tc, (tonumber(h[2]) or tc) + (now - ts) * tr)
+local need = math.min(tonumber(ARGV[6]), tc)
+
+local wait = 0
+if req < 1 then wait = math.max(wait, (1 - req) / rr) end
+if tok < need then wait = math.max(wait, (need - tok) / tr) end
+
+if wait > 0 then
+    redis.call('HSET', KEYS[1], 'req', req, 'tok', tok, 'ts', now)
+else
+    redis.call('HSET', KEYS[1], 'req', req - 1, 'tok', tok - need, 'ts', now)
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[7])
+return math.ceil(wait)
+"""
+
+_PAUSE_SCRIPT = """
+local until_ms = tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'paused_until')) or 0
+if until_ms > current then
+    redis.call('HSET', KEYS[1], 'paused_until', until_ms)
+end
+return 1
+"""
+
+
+class RedisRateLimiter:
+    """
+    Same buckets, shared by every worker through one Redis hash.
+    Wall-clock ms are used, so worker clocks should be NTP-synced.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: int = EMBED_RPM_LIMIT,
+        tpm: int = EMBED_TPM_LIMIT,
+        burst_sec: float = EMBED_BURST_SEC,
+    ):
+        import redis  # lazy import
+        from app.repos.redis_jobs import REDIS_PREFIX, get_redis_pool
+
+        self.client = redis.Redis(connection_pool=get_redis_pool())
+        self.key = f"{REDIS_PREFIX}embed:ratelimit:{name}"
+        self.args = [
+            rpm / 60_000,
+            max(1.0, rpm / 60 * burst_sec),
+            tpm / 60_000,
+            max(1.0, tpm / 60 * burst_sec),
+        ]
+        self.ttl_ms = int(max(burst_sec, 60) * 2000)
+        self._reserve = self.client.register_script(_RESERVE_SCRIPT)
+        self._pause = self.client.register_script(_PAUSE_SCRIPT)
+
+    def reserve(self, tokens: int) -> float:
+        wait_ms = self._reserve(
+            keys=[self.key],
+            args=[int(time.time() * 1000), *self.args, tokens, self.ttl_ms],
+        )
+        return float(wait_ms) / 1000
+
+    def pause(self, seconds: float):
+        self._pause(
+            keys=[self.key],
+            args=[int((time.time() + seconds) * 1000)],
+        )
+
+
+# -------------------------------------------------
+# Scheduler
+# -------------------------------------------------
+class EmbedScheduler:
+    """
+    Process-wide embedding request scheduler.
+
+    - requests run concurrently on a private event-loop thread
+    - each request first reserves 1 request + its tokens from the
+      rate limiter (local or shared through Redis)
+    - a 429 pauses the whole limiter for Retry-After and halves the
+      concurrency; successes grow it back one slot at a time (AIMD)
+    - connection errors / 5xx are retried with jittered backoff
+    """
+
+    def __init__(
+        self,
+        model: str,
+        limiter=None,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        min_concurrency: int = EMBED_MIN_CONCURRENCY,
+        dimensions: Optional[int] = None,
+    ):
+        self.pid = os.getpid()
+        self.model = model
+        self.dimensions = dimensions
+        self.limiter = limiter or LocalRateLimiter()
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+
+        self.limit = self.max_concurrency
+        self._active = 0
+        self._successes = 0
+
+        self._client = openai.AsyncOpenAI(
+            base_url=os.getenv("OPENAI_API_BASE") or None,
+            max_retries=0,   # retries are ours (limiter-aware)
+            timeout=EMBED_REQUEST_TIMEOUT,
+        )
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="embed-scheduler",
+            daemon=True,
+        )
+        self._thread.start()
+        self._slots = asyncio.Condition()
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+    def embed(
+        self,
+        batches: List[List[str]],
+        token_counts: List[int],
+    ) -> List[np.ndarray]:
+        """
+        One request per batch; a float32 (len(batch), dims) array per
+        batch, rows in input order.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._embed_all(batches, token_counts), self._loop
+        ).result()
+
+    def stats(self) -> Dict:
+        return {"concurrency": self.limit, "active": self._active}
+
+    def close(self):
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    # --------------------------------------------------
+    # Internals (run on the scheduler loop)
+    # --------------------------------------------------
+    async def _embed_all(self, batches, token_counts):
+        per_call = asyncio.Semaphore(max(1, EMBED_CALL_MAX_INFLIGHT))
+        return await asyncio.gather(*(
+            self._embed_one(texts, tokens, per_call)
+            for texts, tokens in zip(batches, token_counts)
+        ))
+
+    async def _acquire_slot(self):
+        async with self._slots:
+            await self._slots.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+    async def _release_slot(self, throttled: bool):
+        async with self._slots:
+            self._active -= 1
+            if throttled:
+                self.limit = max(self.min_concurrency, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+                    self._successes = 0
+            self._slots.notify_all()
+
+    async def _reserve(self, tokens: int):
+        while True:
+            wait = await asyncio.to_thread(self.limiter.reserve, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _embed_one(self, texts: List[str], tokens: int, per_call):
+        # base64 → raw float32 bytes, no JSON float parsing
+        kwargs = {"model": self.model, "input": texts, "encoding_format": "base64"}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+
+        async with per_call:
+            for attempt in range(1, EMBED_MAX_ATTEMPTS + 1):
+                await self._acquire_slot()
+                throttled = False
+                try:
+                    await self._reserve(tokens)
+                    with stage_timer("embed"):
+                        resp = await self._client.embeddings.create(**kwargs)
+                    return np.stack([
+                        np.frombuffer(base64.b64decode(d.embedding), dtype=np.float32)
+                        for d in sorted(resp.data, key=lambda d: d.index)
+                    ])
+
+                except openai.RateLimitError as e:
+                    throttled = True
+                    EMBED_THROTTLED.inc()
+                    delay = retry_after_seconds(
+                        getattr(e.response, "headers", None)
+                    ) or min(60.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+                    await asyncio.to_thread(self.limiter.pause, delay)
+                    print(f"⏳ Embedding rate limited → retry in {delay:.1f}s")
+                    if attempt == EMBED_MAX_ATTEMPTS:
+                        raise
+
+                except _RETRYABLE:
+                    if attempt == EMBED_MAX_ATTEMPTS:
+                        raise
+                    delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+                finally:
+                    await self._release_slot(throttled)
+
+                await asyncio.sleep(delay)
+
+
+# -------------------------------------------------
+# Shared instance (one scheduler per process)
+# -------------------------------------------------
+# (model, dimensions) → scheduler; schedulers of one model share its
+# rate limiter (the RPM / TPM budget is per model)
+_SCHEDULERS: Dict[Tuple[str, Optional[int]], EmbedScheduler] = {}
+_LIMITERS: Dict[str, object] = {}
+_SCHEDULERS_PID = os.getpid()
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_embed_scheduler(model: str, dimensions: Optional[int] = None) -> EmbedScheduler:
+    global _SCHEDULERS_PID
+    with _SCHEDULER_LOCK:
+        # Fresh schedulers after fork (Celery prefork children)
+        if _SCHEDULERS_PID != os.getpid():
+            _SCHEDULERS.clear()
+            _LIMITERS.clear()
+            _SCHEDULERS_PID = os.getpid()
+
+        key = (model, dimensions)
+        if key not in _SCHEDULERS:
+            if model not in _LIMITERS:
+                _LIMITERS[model] = (
+                    RedisRateLimiter(model)
+                    if EMBED_RATE_LIMITER == "redis"
+                    else LocalRateLimiter()
+                )
+            _SCHEDULERS[key] = EmbedScheduler(
+                model,
+                limiter=_LIMITERS[model],
+                dimensions=dimensions,
+            )
+        return _SCHEDULERS[key]
+
+
+def shutdown_embed_scheduler(**_):
+    with _SCHEDULER_LOCK:
+        schedulers = list(_SCHEDULERS.values())
+        _SCHEDULERS.clear()
+        _LIMITERS.clear()
+    for scheduler in schedulers:
+        if scheduler.pid == os.getpid():
+            scheduler.close()
+
+
+atexit.register(shutdown_embed_scheduler)
@@ -1,16 +1,166 @@
 # app/repos/embeddings.py
 
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.repos.pinecone_repo import PineconeRepo
-from typing import List, Optional
+from app.repos.pinecone_repo import get_pinecone_repo
+from app.repos.chunk_store import get_chunk_store
+from app.repos.embedding_cache import cache_key, get_embedding_cache
+from app.metrics import EMBED_CACHE, EMBED_TOKENS, stage_timer
+from app.services.chunker import Chunk, TokenChunker
+from app.services.dedup import DEDUP_ENABLE, JobDeduper
+from app.services.embed_scheduler import get_embed_scheduler
+from typing import Dict, List, Optional
+import hashlib
+import os
 import uuid
 
+import numpy as np
+import tiktoken
+
 
 # -------------------------
 # Embedding model
 # -------------------------
-emb = OpenAIEmbeddings(model="text-embedding-3-small")
+EMBED_MODEL = "text-embedding-3-small"
+
+# Output size (text-embedding-3 `dimensions`); unset → model default 1536.
+# Must match the Pinecone index dimension.
+EMBED_DIMENSIONS = int(os.getenv("EMBED_DIMENSIONS", 0)) or None
+
+# Per-request packing limits (OpenAI caps: 2048 inputs / 300k tokens)
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", 250_000))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", 2048))
+
+emb = OpenAIEmbeddings(
+    model=EMBED_MODEL,
+    dimensions=EMBED_DIMENSIONS,
+    chunk_size=EMBED_BATCH_MAX_ITEMS,
+)
+encoding = tiktoken.encoding_for_model(EMBED_MODEL)
+
+
+# -------------------------
+# Chunking (CHUNK_TOKENS / CHUNK_OVERLAP_TOKENS)
+# -------------------------
+chunker = TokenChunker(encoding)
+
+
+def chunk_texts(texts: List[str], join: bool = True) -> List[Chunk]:
+    with stage_timer("chunk"):
+        return chunker.chunk(texts, join=join)
+
+
+def split_text(texts: List[str]) -> List[str]:
+    return [c.text for c in chunk_texts(texts)]
+
+
+def count_tokens(text: str) -> int:
+    return len(encoding.encode_ordinary(text))
+
+
+def new_job_deduper() -> Optional[JobDeduper]:
+    """
+    Dedup state for one crawl job (DEDUP_ENABLE), None when disabled.
+    """
+    return JobDeduper(count_tokens) if DEDUP_ENABLE else None
+
+
+# -------------------------
+# Batched embedding
+# -------------------------
+def pack_batches(
+    token_counts: List[int],
+    max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+    max_items: int = EMBED_BATCH_MAX_ITEMS,
+) -> List[range]:
+    """
+    Greedy packing of consecutive chunks into request-sized ranges.
+    """
+    batches = []
+    start = 0
+    tokens = 0
+
+    for i, n in enumerate(token_counts):
+        full = i - start >= max_items or tokens + n > max_tokens
+        if full and i > start:
+            batches.append(range(start, i))
+            start, tokens = i, 0
+        tokens += n
+
+    if start < len(token_counts):
+        batches.append(range(start, len(token_counts)))
+
+    return batches
+
+
+def _embed_uncached(chunks: List[str]) -> np.ndarray:
+    token_counts = [len(t) for t in encoding.encode_ordinary_batch(chunks)]
+    EMBED_TOKENS.inc(sum(token_counts))
+
+    # Batches go out concurrently, within the worker-wide RPM / TPM budget
+    batches = pack_batches(token_counts)
+    results = get_embed_scheduler(EMBED_MODEL, EMBED_DIMENSIONS).embed(
+        [chunks[b.start:b.stop] for b in batches],
+        [sum(token_counts[b.start:b.stop]) for b in batches],
+    )
+
+    return np.concatenate(results)
+
+
+def embed_chunks(chunks: List[str]) -> np.ndarray:
+    """
+    Embeds chunks in as few OpenAI requests as the token budget allows.
+    Chunks already in the embedding cache (model + dims + text hash) are
+    not sent to OpenAI.
+
+    Returns a float32 (len(chunks), dims) array in input order; rows
+    become lists only at the Pinecone boundary.
+    """
+    if not chunks:
+        return np.empty((0, EMBED_DIMENSIONS or 0), dtype=np.float32)
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return _embed_uncached(chunks)
+
+    keys = [cache_key(EMBED_MODEL, c, EMBED_DIMENSIONS) for c in chunks]
+    found = cache.get_many(list(dict.fromkeys(keys)))
+
+    # Unique misses only (repeated chunks are embedded once)
+    missing: Dict[str, str] = {}
+    for key, chunk in zip(keys, chunks):
+        if key not in found:
+            missing.setdefault(key, chunk)
+
+    if missing:
+        fresh = dict(zip(missing, _embed_uncached(list(missing.values()))))
+        cache.put_many(fresh)
+        found.update(fresh)
+
+    EMBED_CACHE.labels(result="hit").inc(len(chunks) - len(missing))
+    EMBED_CACHE.labels(result="miss").inc(len(missing))
+
+    print(
+        f"🧠 Embedding cache → hits={len(chunks) - len(missing)}, "
+        f"embedded={len(missing)}"
+    )
+
+    return np.stack([found[k] for k in keys])
+
+
+def offload_texts(userId: str, vectors: List[Dict]):
+    """
+    With a chunk store, chunk text moves out of the Pinecone metadata
+    into the store. Called before the upsert, so a query never finds a
+    vector whose text is missing.
+    """
+    store = get_chunk_store()
+    if store is None:
+        return
+    store.put_many(userId, {
+        v["id"]: v["metadata"].pop("text")
+        for v in vectors
+        if "text" in v["metadata"]
+    })
 
 
 def build_embeddings(
@@ -27,29 +177,23 @@ def build_embeddings(
     - PDF
     - Website
 
-    Storage model (NEW):
-    - Pinecone ONLY
-    - Vector + FULL TEXT + metadata stored together
+    Storage model:
+    - Pinecone: vector + filterable metadata
+    - chunk text: in the metadata too, or in the chunk store
+      (CHUNK_STORE) when one is configured
     """
 
     # -------------------------
-    # Text chunking
+    # Text chunking (source index → page)
     # -------------------------
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1600,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", " ", ""],
-    )
-
-    full_text = "\n".join(texts)
-    chunks = splitter.split_text(full_text)
+    chunks = chunk_texts(texts)
 
     if not chunks:
-        return
+        return 0
 
-    embeddings = emb.embed_documents(chunks)
+    embeddings = embed_chunks([c.text for c in chunks])
 
-    pinecone = PineconeRepo()
+    pinecone = get_pinecone_repo()
 
     # Namespace = user isolation + conversation isolation
     namespace = userId
@@ -68,17 +212,19 @@ def build_embeddings(
         )
 
         # -------------------------
-        # Metadata (TEXT INCLUDED)
+        # Metadata (text moves to the chunk store if enabled)
         # -------------------------
         metadata = {
             "userId": userId,
             "chunkId": chunk_id,
             "sourceType": sourceType,
-            "text": chunk,   # TEXT STORED IN PINECONE
+            "text": chunk.text,
         }
 
-        if sourceType == "pdf" and pages and i < len(pages):
-            metadata["page"] = pages[i]
+        if sourceType == "pdf" and pages:
+            metadata["page"] = pages[chunk.source]
+            if chunk.source_end != chunk.source:
+                metadata["pageEnd"] = pages[chunk.source_end]
 
         if sourceType == "web" and url:
             metadata["url"] = url
@@ -92,8 +238,86 @@ def build_embeddings(
     # -------------------------
     # Upsert to Pinecone
     # -------------------------
+    offload_texts(userId, vectors)
     pinecone.upsert(
     userId=userId,
     vectors=vectors,
     )
 
+    return len(vectors)
+
+
+def page_chunk_prefix(url: str) -> str:
+    """
+    Stable per-URL vector id prefix (same page → same ids on re-crawl).
+    """
+    return "web-" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def build_web_embeddings(
+    *,
+    userId: str,
+    pages: List[Dict[str, str]],
+    deduper: Optional[JobDeduper] = None,
+) -> Dict[str, int]:
+    """
+    Embeds a whole crawl in one pass:
+    - drops boilerplate sentences, duplicate pages and duplicate chunks
+      (pass a deduper to read what was saved)
+    - chunks every page
+    - packs chunks from ALL pages into token-budgeted requests
+    - maps vectors back to their page URL
+    - single upsert
+
+    Chunk ids are `{page_chunk_prefix(url)}_{i}`.
+
+    Returns chunks embedded per page URL.
+    """
+
+    chunks: List[str] = []
+    owners: List[tuple] = []   # (url, chunkId) per chunk
+    counts: Dict[str, int] = {page["url"]: 0 for page in pages}
+
+    deduper = deduper or new_job_deduper()
+    if deduper is not None:
+        pages = deduper.filter_pages(pages)
+
+    # One encode for all pages; chunks never span pages
+    for chunk in chunk_texts([p["text"] for p in pages], join=False):
+        if deduper is not None and not deduper.keep_chunk(chunk.text, chunk.tokens):
+            continue
+        url = pages[chunk.source]["url"]
+        i = counts[url]
+        counts[url] += 1
+        chunks.append(chunk.text)
+        owners.append((url, f"{page_chunk_prefix(url)}_{i}"))
+
+    if deduper is not None:
+        print(f"♻️ Dedup → {deduper.saved}")
+
+    if not chunks:
+        return counts
+
+    embeddings = embed_chunks(chunks)
+
+    vectors = []
+    for chunk, (url, chunk_id), vector in zip(chunks, owners, embeddings):
+        vectors.append({
+            "id": chunk_id,
+            "values": vector,
+            "metadata": {
+                "userId": userId,
+                "chunkId": chunk_id,
+                "sourceType": "web",
+                "text": chunk,
+                "url": url,
+            },
+        })
+
+    offload_texts(userId, vectors)
+    get_pinecone_repo().upsert(
+        userId=userId,
+        vectors=vectors,
+    )
+
+    return counts
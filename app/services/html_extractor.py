@@ -1,34 +1,40 @@
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 import re
 
 MIN_TEXT_LENGTH = 500
 
+_DROP_TAGS = (
+    "script", "style", "noscript", "iframe", "svg",
+    "header", "footer", "nav", "aside", "form", "button"
+)
+
 
 def extract_web_text(html: str) -> str:
     if not html or len(html.strip()) < 200:
         raise ValueError("HTML too short")
 
-    soup = BeautifulSoup(html, "html.parser")
+    try:
+        doc = lxml_html.document_fromstring(
+            html.encode("utf-8", "replace"),
+            parser=lxml_html.HTMLParser(encoding="utf-8"),
+        )
+    except (etree.ParserError, ValueError):
+        raise ValueError("No meaningful content")
 
-    for tag in soup([
-        "script", "style", "noscript", "iframe", "svg",
-        "header", "footer", "nav", "aside", "form", "button"
-    ]):
-        tag.decompose()
+    etree.strip_elements(doc, *_DROP_TAGS, with_tail=False)
 
-    main = (
-        soup.find("article")
-        or soup.find("main")
-        or soup.find("section")
-        or soup.body
-    )
+    main = None
+    for xpath in (".//article", ".//main", ".//section", "body"):
+        main = doc.find(xpath)
+        if main is not None:
+            break
 
-    if not main:
+    if main is None:
         raise ValueError("No meaningful content")
 
     blocks = []
-    for el in main.find_all(["p", "li", "h1", "h2", "h3"]):
-        txt = el.get_text(" ", strip=True)
+    for el in main.iter("p", "li", "h1", "h2", "h3"):
+        txt = " ".join(s.strip() for s in el.itertext() if s.strip())
         if len(txt) >= 40:
             blocks.append(txt)
 
@@ -0,0 +1,217 @@
+# app/services/http_client.py
+import asyncio
+import atexit
+import os
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120 Safari/537.36"
+)
+
+HTTP_CONNECT_TIMEOUT_SEC = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", 10))
+HTTP_READ_TIMEOUT_SEC = float(os.getenv("HTTP_READ_TIMEOUT_SEC", 20))
+
+# Pool (whole process) / in-flight requests per host
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 64))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 8))
+HTTP_KEEPALIVE_SEC = float(os.getenv("HTTP_KEEPALIVE_SEC", 30))
+
+# Needs the `h2` package (httpx[http2])
+HTTP2_ENABLE = os.getenv("HTTP2_ENABLE", "false").lower() == "true"
+
+# Default body cap (HTML pages); callers pass their own for downloads
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", 10 * 1024 * 1024))
+
+
+class ResponseTooLarge(ValueError):
+    pass
+
+
+class HttpResult(NamedTuple):
+    status: int
+    url: str                    # final URL (after redirects)
+    headers: httpx.Headers
+    content: bytes              # decoded (gzip / deflate / br); empty if not 2xx
+    charset: Optional[str]
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.charset or "utf-8", errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpClient:
+    """
+    Process-wide outbound HTTP (crawler, sitemaps, source downloads).
+
+    - one httpx.AsyncClient on a private event-loop thread, so sync
+      callers and async callers on any loop share its keep-alive pool
+      (no new DNS / TCP / TLS per request, per crawl or per job)
+    - HTTP/2 when HTTP2_ENABLE and h2 is installed
+    - gzip / deflate decoded by httpx (br too with brotli installed)
+    - at most HTTP_MAX_PER_HOST requests in flight per host
+    - bodies are streamed and capped at `max_bytes`
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_per_host: int = HTTP_MAX_PER_HOST,
+        http2: bool = HTTP2_ENABLE,
+    ):
+        self.pid = os.getpid()
+        self.max_per_host = max(1, max_per_host)
+
+        if http2 and not _http2_available():
+            print("⚠️ HTTP2_ENABLE set but h2 is not installed → HTTP/1.1")
+            http2 = False
+
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(
+                HTTP_READ_TIMEOUT_SEC,
+                connect=HTTP_CONNECT_TIMEOUT_SEC,
+            ),
+            follow_redirects=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=HTTP_KEEPALIVE_SEC,
+            ),
+        )
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="http-client",
+            daemon=True,
+        )
+        self._thread.start()
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+    def get(
+        self,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = HTTP_MAX_RESPONSE_BYTES,
+        timeout: Optional[float] = None,
+    ) -> HttpResult:
+        return self._submit(self._get(url, headers, max_bytes, timeout, None)).result()
+
+    async def get_async(
+        self,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        max_bytes: int = HTTP_MAX_RESPONSE_BYTES,
+        timeout: Optional[float] = None,
+        on_chunk: Optional[Callable[[bytes], bool]] = None,
+    ) -> HttpResult:
+        """
+        With `on_chunk`, the body is handed over chunk by chunk (on the
+        client thread) instead of being collected; return True to stop.
+        """
+        return await asyncio.wrap_future(
+            self._submit(self._get(url, headers, max_bytes, timeout, on_chunk))
+        )
+
+    def close(self):
+        if not self._loop.is_running():
+            return
+        try:
+            self._submit(self._client.aclose()).result(timeout=10)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    # --------------------------------------------------
+    # Internals (run on the client loop)
+    # --------------------------------------------------
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).hostname or ""
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_slots[host]
+
+    async def _get(self, url, headers, max_bytes, timeout, on_chunk) -> HttpResult:
+        kwargs = {"headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        async with self._host_slot(url):
+            async with self._client.stream("GET", url, **kwargs) as r:
+                body = bytearray()
+
+                if r.is_success:
+                    declared = r.headers.get("content-length", "")
+                    if declared.isdigit() and int(declared) > max_bytes and on_chunk is None:
+                        raise ResponseTooLarge(f"Response exceeds {max_bytes} bytes")
+
+                    async for chunk in r.aiter_bytes():
+                        if on_chunk is not None:
+                            if on_chunk(chunk):
+                                break
+                            continue
+                        body.extend(chunk)
+                        if len(body) > max_bytes:
+                            raise ResponseTooLarge(f"Response exceeds {max_bytes} bytes")
+
+                return HttpResult(
+                    r.status_code,
+                    str(r.url),
+                    r.headers,
+                    bytes(body),
+                    r.charset_encoding,
+                )
+
+
+# --------------------------------------------------
+# Shared instance (one client per process)
+# --------------------------------------------------
+_CLIENT: Optional[HttpClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _CLIENT
+    with _CLIENT_LOCK:
+        # Fresh client after fork (Celery prefork children)
+        if _CLIENT is None or _CLIENT.pid != os.getpid():
+            _CLIENT = HttpClient()
+        return _CLIENT
+
+
+def shutdown_http_client(**_):
+    global _CLIENT
+    with _CLIENT_LOCK:
+        client, _CLIENT = _CLIENT, None
+    if client is not None and client.pid == os.getpid():
+        client.close()
+
+
+atexit.register(shutdown_http_client)
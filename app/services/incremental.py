@@ -0,0 +1,140 @@
+# app/services/incremental.py
+
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+from app.repos.chunk_store import get_chunk_store
+from app.repos.crawl_state import get_crawl_state_repo
+from app.repos.pinecone_repo import get_pinecone_repo
+from app.services.dedup import JobDeduper
+from app.services.embeddings import build_web_embeddings, page_chunk_prefix
+
+STATE_FIELDS = (
+    "etag", "lastModified", "lastmod", "hash", "chunks", "title", "aliases",
+)
+MAX_STORED_LINKS = 200
+
+# Pages missing from this many complete crawls in a row are removed
+# (404/410 removes them at once)
+CRAWL_MISSES_BEFORE_REMOVE = int(os.getenv("CRAWL_MISSES_BEFORE_REMOVE", 3))
+
+
+def text_hash(text: str) -> str:
+    """
+    Hash of whitespace-normalized text (layout-only changes don't count).
+    """
+    normalized = " ".join((text or "").split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _chunk_ids(url: str, start: int, stop: int) -> List[str]:
+    prefix = page_chunk_prefix(url)
+    return [f"{prefix}_{i}" for i in range(start, stop)]
+
+
+def sync_web_pages(
+    *,
+    userId: str,
+    source: str,
+    pages: List[Dict],
+    prior: Dict[str, Dict],
+    truncated: bool,
+    deduper: Optional[JobDeduper] = None,
+) -> Dict[str, int]:
+    """
+    Applies an incremental crawl (smart_crawl(..., prior=prior)):
+
+    - unchanged pages (304 / same sitemap lastmod / same text hash)
+      are not embedded again
+    - new and changed pages are embedded; leftover chunk ids from a
+      longer previous version are deleted
+    - pages answering 404/410 are deleted; pages whose fetch failed
+      keep their old state and vectors
+    - pages missing from a crawl not cut by max_pages are deleted after
+      CRAWL_MISSES_BEFORE_REMOVE such crawls in a row
+    - the new per-URL state is saved for the next run
+
+    Dedup only sees the pages embedded in this run; a page that merely
+    duplicates an unchanged one is not detected.
+    """
+
+    state: Dict[str, Dict] = {}
+    to_embed: List[Dict] = []
+    stale_ids: List[str] = []
+    stats = {
+        "new": 0, "changed": 0, "unchanged": 0,
+        "failed": 0, "removed": 0, "chunks": 0,
+    }
+    gone = set()
+    failed = set()
+
+    for page in pages:
+        url = page["url"]
+        known = prior.get(url)
+        status = page.get("status")
+
+        if status == "gone":
+            gone.add(url)
+            continue
+        if status == "error":
+            failed.add(url)
+            continue
+
+        entry = {k: page.get(k) for k in STATE_FIELDS}
+        entry["links"] = (page.get("links") or [])[:MAX_STORED_LINKS]
+
+        if status != "unchanged":
+            entry["hash"] = text_hash(page["text"])
+
+        if known and (status == "unchanged" or known.get("hash") == entry["hash"]):
+            entry["hash"] = known.get("hash")
+            entry["chunks"] = known.get("chunks", 0)
+            stats["unchanged"] += 1
+        else:
+            to_embed.append(page)
+            stats["changed" if known else "new"] += 1
+
+        state[url] = entry
+
+    # -------- Embed new / changed --------
+    counts = (
+        build_web_embeddings(userId=userId, pages=to_embed, deduper=deduper)
+        if to_embed else {}
+    )
+
+    for url, n in counts.items():
+        state[url]["chunks"] = n
+        stats["chunks"] += n
+        old = (prior.get(url) or {}).get("chunks", 0)
+        stale_ids.extend(_chunk_ids(url, n, old))
+
+    # -------- Disappeared pages --------
+    for url, known in prior.items():
+        if url in state:
+            continue
+
+        if url in failed:
+            stats["failed"] += 1
+            state[url] = known   # try again next time
+            continue
+        if truncated and url not in gone:
+            state[url] = known   # just not reached this time
+            continue
+
+        misses = known.get("misses", 0) + 1
+        if url in gone or misses >= CRAWL_MISSES_BEFORE_REMOVE:
+            stale_ids.extend(_chunk_ids(url, 0, known.get("chunks", 0)))
+            stats["removed"] += 1
+        else:
+            state[url] = {**known, "misses": misses}
+
+    if stale_ids:
+        get_pinecone_repo().delete_ids(userId=userId, ids=stale_ids)
+        store = get_chunk_store()
+        if store is not None:
+            store.delete_ids(userId, stale_ids)
+
+    get_crawl_state_repo().save(userId, source, state)
+
+    return stats
@@ -1,22 +1,226 @@
-from playwright.sync_api import sync_playwright
+import asyncio
+import atexit
+import os
+import threading
+from typing import Optional
+
+from playwright.async_api import async_playwright
 
 JS_TIMEOUT = 25_000
 
+# Browser pool (one Chromium per worker process)
+BROWSER_POOL_PAGES = int(os.getenv("BROWSER_POOL_PAGES", 4))
+BROWSER_CONTEXT_MAX_NAVIGATIONS = int(
+    os.getenv("BROWSER_CONTEXT_MAX_NAVIGATIONS", 50)
+)
+BROWSER_CONTEXT_MAX_HEAP_MB = int(os.getenv("BROWSER_CONTEXT_MAX_HEAP_MB", 512))
+
+CHROMIUM_ARGS = ["--no-sandbox", "--disable-dev-shm-usage"]
+
+
+class _PooledContext:
+    def __init__(self, context):
+        self.context = context
+        self.navigations = 0
+        self.heap_bytes = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Long-lived Chromium shared by every render in this process.
+
+    - Playwright runs on a private event-loop thread, so both sync
+      callers and the async crawler can submit renders to it
+    - at most `max_pages` pages are open at once
+    - the browser context is recycled after `max_navigations` renders
+      or once a page's JS heap passes `max_heap_mb`
+    - Chromium is relaunched automatically after a crash
+    """
+
+    def __init__(
+        self,
+        max_pages: int = BROWSER_POOL_PAGES,
+        max_navigations: int = BROWSER_CONTEXT_MAX_NAVIGATIONS,
+        max_heap_mb: int = BROWSER_CONTEXT_MAX_HEAP_MB,
+    ):
+        self.pid = os.getpid()
+        self.max_navigations = max_navigations
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024
+
+        self._playwright = None
+        self._browser = None
+        self._current: Optional[_PooledContext] = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="browser-pool",
+            daemon=True,
+        )
+        self._thread.start()
+
+        self._slots = asyncio.Semaphore(max(1, max_pages))
+        self._launch_lock = asyncio.Lock()
+
+    # --------------------------------------------------
+    # Public API
+    # --------------------------------------------------
+    def render(self, url: str) -> str:
+        return self._submit(self._render(url)).result()
+
+    async def render_async(self, url: str) -> str:
+        return await asyncio.wrap_future(self._submit(self._render(url)))
+
+    def close(self):
+        if not self._loop.is_running():
+            return
+        try:
+            self._submit(self._shutdown()).result(timeout=30)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    # --------------------------------------------------
+    # Internals (run on the pool loop)
+    # --------------------------------------------------
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _ensure_browser(self):
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+
+            # First launch, or Chromium crashed → start over
+            await self._close_browser()
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=CHROMIUM_ARGS,
+            )
+            return self._browser
+
+    async def _acquire_context(self, browser) -> _PooledContext:
+        if self._current is None or self._current.retired:
+            self._current = _PooledContext(await browser.new_context())
+        return self._current
+
+    async def _release_context(self, pooled: _PooledContext):
+        if (
+            pooled.navigations >= self.max_navigations
+            or pooled.heap_bytes >= self.max_heap_bytes
+        ):
+            pooled.retired = True
+
+        if pooled.retired and pooled.active == 0:
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+
+    async def _render(self, url: str) -> str:
+        async with self._slots:
+            for attempt in range(2):
+                browser = await self._ensure_browser()
+                pooled = await self._acquire_context(browser)
+                pooled.active += 1
+                pooled.navigations += 1
+
+                page = None
+                try:
+                    page = await pooled.context.new_page()
+                    await page.goto(url, timeout=JS_TIMEOUT)
+                    await page.wait_for_load_state("networkidle")
+                    html = await page.content()
+                    pooled.heap_bytes = max(
+                        pooled.heap_bytes,
+                        await self._heap_usage(page),
+                    )
+                    return html
+                except Exception:
+                    if not browser.is_connected():
+                        pooled.retired = True
+                        if attempt == 0:
+                            continue  # relaunch once and retry
+                    raise
+                finally:
+                    if page is not None:
+                        try:
+                            await page.close()
+                        except Exception:
+                            pass
+                    pooled.active -= 1
+                    await self._release_context(pooled)
+
+    async def _heap_usage(self, page) -> int:
+        try:
+            return int(await page.evaluate(
+                "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+            ))
+        except Exception:
+            return 0
+
+    async def _close_browser(self):
+        self._current = None
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+    async def _shutdown(self):
+        await self._close_browser()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+
+# -------------------------------------------------
+# Per-process pool
+# -------------------------------------------------
+_POOL: Optional[BrowserPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    global _POOL
+    with _POOL_LOCK:
+        # Fresh pool after fork (Celery prefork children)
+        if _POOL is None or _POOL.pid != os.getpid():
+            _POOL = BrowserPool()
+        return _POOL
+
+
+def shutdown_browser_pool(**_):
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None and pool.pid == os.getpid():
+        pool.close()
+
+
+atexit.register(shutdown_browser_pool)
+
 
 def render_js_page(url: str) -> str:
     """
     Returns fully rendered HTML after JS execution.
     """
+    return get_browser_pool().render(url)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-dev-shm-usage"]
-        )
-        page = browser.new_page()
-        page.goto(url, timeout=JS_TIMEOUT)
-        page.wait_for_load_state("networkidle")
-        html = page.content()
-        browser.close()
 
-    return html
+async def render_js_page_async(url: str) -> str:
+    """
+    Async variant for callers already running an event loop.
+    """
+    return await get_browser_pool().render_async(url)
@@ -4,87 +4,188 @@ from pdf2image import convert_from_path
 import pytesseract
 import tempfile
 import os
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from app.metrics import OCR_PAGES, stage_timer
 
 OCR_ENABLE = os.getenv("OCR_ENABLE", "true").lower() == "true"
 OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", 500))
 OCR_DPI = int(os.getenv("OCR_DPI", 220))
 OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 0))  # 0 → CPUs available
+OCR_WINDOW_PAGES = int(os.getenv("OCR_WINDOW_PAGES", 32))
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
 
 
-def extract_pages(pdf_bytes: bytes) -> Tuple[List[str], int, int, List[int]]:
+def contiguous_runs(page_nums: List[int]) -> List[Tuple[int, int]]:
     """
-    Extract text from PDF pages.
-    OCR fallback if text is missing or too small.
+    [1, 2, 3, 7, 8] → [(1, 3), (7, 8)]
+    """
+    runs: List[Tuple[int, int]] = []
+    for n in sorted(page_nums):
+        if runs and n == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], n)
+        else:
+            runs.append((n, n))
+    return runs
 
-    Returns:
-    - page_texts
-    - page_count
-    - total_words
-    - ocr_pages
+
+def _ocr_image(path: str) -> str:
+    try:
+        return pytesseract.image_to_string(path, lang=OCR_LANG).strip()
+    except Exception:
+        return ""
+
+
+def ocr_pages(pdf_path: str, page_nums: List[int]) -> Dict[int, str]:
     """
+    OCR the given 1-based pages.
 
-    texts: List[str] = []
-    ocr_pages: List[int] = []
+    - rasterizes each contiguous run of pages in one poppler pass
+      (images go to a temp dir, not memory)
+    - runs tesseract on up to OCR_WORKERS pages at once
+
+    Each tesseract call is already its own process (pytesseract shells
+    out), so a thread pool bounds the process count without forking the
+    Celery worker (daemonic prefork children cannot have children).
+    """
+    if not page_nums:
+        return {}
+
+    OCR_PAGES.inc(len(page_nums))
+    workers = OCR_WORKERS or available_cpus()
+    paths: Dict[int, str] = {}
+
+    with stage_timer("ocr"), tempfile.TemporaryDirectory() as tmp:
+        for first, last in contiguous_runs(page_nums):
+            try:
+                out = convert_from_path(
+                    pdf_path,
+                    dpi=OCR_DPI,
+                    first_page=first,
+                    last_page=last,
+                    output_folder=tmp,
+                    output_file=f"p{first:05d}_",
+                    paths_only=True,
+                    thread_count=min(workers, last - first + 1),
+                )
+            except Exception:
+                continue
+
+            # pdf2image returns paths sorted in page order
+            if len(out) == last - first + 1:
+                paths.update(zip(range(first, last + 1), out))
+
+        if not paths:
+            return {}
+
+        nums = sorted(paths)
+        with ThreadPoolExecutor(max_workers=min(workers, len(nums))) as pool:
+            texts = pool.map(_ocr_image, [paths[n] for n in nums])
+            return dict(zip(nums, texts))
+
+
+def extract_pages(
+    pdf_bytes: bytes,
+) -> Tuple[List[str], List[int], int, int, List[int]]:
+    """
+    Extract text from in-memory PDF bytes.
+    See extract_pages_from_path.
+    """
 
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as f:
         f.write(pdf_bytes)
         pdf_path = f.name
 
     try:
-        reader = PdfReader(pdf_path)
-        page_count = len(reader.pages)
+        return extract_pages_from_path(pdf_path)
+    finally:
+        try:
+            os.remove(pdf_path)
+        except Exception:
+            pass
 
-        for i, page in enumerate(reader.pages):
-            page_num = i + 1
 
-            # -------- normal extraction --------
-            try:
-                raw_text = (page.extract_text() or "").strip()
-            except Exception:
-                raw_text = ""
+def iter_pages(pdf_path: str) -> Iterator[Tuple[int, str, bool]]:
+    """
+    Streams (page_num, text, used_ocr) in page order.
 
-            final_text = raw_text
+    Pages are read in windows of OCR_WINDOW_PAGES so OCR still runs in
+    parallel within a window while the first pages are already yielded.
+    Pages with no usable text are skipped.
+    """
 
-            # -------- OCR decision --------
-            use_ocr = (
-                OCR_ENABLE
-                and len(raw_text) < OCR_MIN_TEXT_CHARS
-            )
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    window = max(OCR_WINDOW_PAGES, 1)
 
-            if use_ocr:
+    for start in range(0, page_count, window):
+        # -------- normal extraction --------
+        raw_texts: Dict[int, str] = {}
+        with stage_timer("pdf_text"):
+            for page_num in range(start + 1, min(start + window, page_count) + 1):
                 try:
-                    images = convert_from_path(
-                        pdf_path,
-                        dpi=OCR_DPI,
-                        first_page=page_num,
-                        last_page=page_num,
-                    )
-
-                    ocr_text = pytesseract.image_to_string(
-                        images[0],
-                        lang=OCR_LANG
+                    raw_texts[page_num] = (
+                        reader.pages[page_num - 1].extract_text() or ""
                     ).strip()
+                except Exception:
+                    raw_texts[page_num] = ""
+
+        # -------- OCR decision + parallel OCR --------
+        needs_ocr = [
+            n for n, raw_text in raw_texts.items()
+            if OCR_ENABLE and len(raw_text) < OCR_MIN_TEXT_CHARS
+        ]
+        ocr_texts = ocr_pages(pdf_path, needs_ocr)
+
+        for page_num, raw_text in raw_texts.items():
+            # prefer OCR if it gives more text
+            ocr_text = ocr_texts.get(page_num, "")
+            used_ocr = len(ocr_text) > len(raw_text)
+            final_text = ocr_text if used_ocr else raw_text
+
+            # IMPORTANT: only yield non-empty text
+            if final_text.strip():
+                yield page_num, final_text, used_ocr
 
-                    # prefer OCR if it gives more text
-                    if len(ocr_text) > len(raw_text):
-                        final_text = ocr_text
-                        ocr_pages.append(page_num)
 
-                except Exception:
-                    pass
+def page_count(pdf_path: str) -> int:
+    return len(PdfReader(pdf_path).pages)
 
-            # IMPORTANT: only append non-empty text
-            if final_text.strip():
-                texts.append(final_text)
 
-        full_text = "\n\n".join(texts)
-        total_words = len(full_text.split())
+def extract_pages_from_path(
+    pdf_path: str,
+) -> Tuple[List[str], List[int], int, int, List[int]]:
+    """
+    Extract text from PDF pages.
+    OCR fallback if text is missing or too small.
+
+    Returns:
+    - page_texts
+    - page_numbers (1-based, one per text; pages without text skipped)
+    - page_count
+    - total_words
+    - ocr_pages
+    """
 
-        return texts, page_count, total_words, ocr_pages
+    texts: List[str] = []
+    page_nums: List[int] = []
+    ocr_used: List[int] = []
 
-    finally:
-        try:
-            os.remove(pdf_path)
-        except Exception:
-            pass
+    for page_num, text, used_ocr in iter_pages(pdf_path):
+        texts.append(text)
+        page_nums.append(page_num)
+        if used_ocr:
+            ocr_used.append(page_num)
+
+    full_text = "\n\n".join(texts)
+    total_words = len(full_text.split())
+
+    return texts, page_nums, page_count(pdf_path), total_words, ocr_used
@@ -0,0 +1,311 @@
+# app/services/pipeline.py
+
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.crawlers.smart_crawler import iter_crawl
+from app.repos.pinecone_repo import get_pinecone_repo
+from app.services.embeddings import (
+    embed_chunks,
+    encoding,
+    new_job_deduper,
+    offload_texts,
+    page_chunk_prefix,
+    split_text,
+)
+from app.services.dedup import JobDeduper
+from app.services.pdf_extractor import iter_pages
+
+# Bounded hand-off between stages (items per queue)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 256))
+# Embed as soon as this many tokens are buffered...
+PIPELINE_EMBED_BATCH_TOKENS = int(os.getenv("PIPELINE_EMBED_BATCH_TOKENS", 50_000))
+# ...or the oldest buffered item is this old
+PIPELINE_FLUSH_SEC = float(os.getenv("PIPELINE_FLUSH_SEC", 2.0))
+PIPELINE_UPSERT_BATCH = int(os.getenv("PIPELINE_UPSERT_BATCH", 200))
+
+_END = object()
+_TICK = object()   # "nothing arrived for a while" → time-based flush
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+# --------------------------------------------------
+# Queue plumbing
+# --------------------------------------------------
+def _put(q: queue.Queue, item, abort: threading.Event):
+    while True:
+        if abort.is_set():
+            raise PipelineAborted()
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            pass
+
+
+def _drain(q: queue.Queue, abort: threading.Event, tick: bool) -> Iterator:
+    while True:
+        try:
+            item = q.get(timeout=PIPELINE_FLUSH_SEC / 2 if tick else 0.5)
+        except queue.Empty:
+            if abort.is_set():
+                raise PipelineAborted()
+            if tick:
+                yield _TICK
+            continue
+        if item is _END:
+            return
+        yield item
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: List[Tuple[Callable[[Iterator], Iterator], bool]],
+) -> List:
+    """
+    Runs `source` and each stage on its own thread, connected by
+    bounded queues (a slow stage back-pressures the ones before it).
+
+    Stages are (fn, tick): fn maps an input iterator to an output
+    iterator; tick=True also feeds it _TICK markers while idle.
+    Returns the last stage's outputs. The first error in any stage
+    stops every stage and is re-raised.
+    """
+    queues = [queue.Queue(PIPELINE_QUEUE_SIZE) for _ in range(len(stages) + 1)]
+    abort = threading.Event()
+    errors: List[BaseException] = []
+
+    def guard(fn):
+        def run():
+            try:
+                fn()
+            except PipelineAborted:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                abort.set()
+        return run
+
+    def feed():
+        try:
+            for item in source:
+                _put(queues[0], item, abort)
+        finally:
+            close = getattr(source, "close", None)
+            if close:
+                close()
+        _put(queues[0], _END, abort)
+
+    def stage(i, fn, tick):
+        def run():
+            for out in fn(_drain(queues[i], abort, tick)):
+                _put(queues[i + 1], out, abort)
+            _put(queues[i + 1], _END, abort)
+        return run
+
+    threads = [threading.Thread(target=guard(feed), name="pipeline-source")]
+    for i, (fn, tick) in enumerate(stages):
+        threads.append(threading.Thread(
+            target=guard(stage(i, fn, tick)),
+            name=f"pipeline-{fn.__name__}",
+        ))
+    for t in threads:
+        t.daemon = True
+        t.start()
+
+    results = []
+    try:
+        for item in _drain(queues[-1], abort, tick=False):
+            results.append(item)
+    except PipelineAborted:
+        pass
+    finally:
+        if errors:
+            abort.set()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+# --------------------------------------------------
+# Stages
+# --------------------------------------------------
+def chunk_pages(userId: str, deduper: Optional[JobDeduper] = None):
+    def chunk_stage(pages: Iterator[Dict]) -> Iterator[Dict]:
+        """
+        {"sourceType", "text", "url" | "page"} → chunk records
+        (duplicate chunks dropped when a deduper is given)
+        """
+        for page in pages:
+            web = page["sourceType"] == "web"
+            prefix = page_chunk_prefix(page["url"]) if web else None
+
+            chunks = split_text([page["text"]])
+            if deduper is not None:
+                chunks = [c for c in chunks if deduper.keep_chunk(c)]
+
+            for i, chunk in enumerate(chunks):
+                chunk_id = f"{prefix}_{i}" if web else f"chunk_{uuid.uuid4().hex}"
+                metadata = {
+                    "userId": userId,
+                    "chunkId": chunk_id,
+                    "sourceType": page["sourceType"],
+                    "text": chunk,
+                }
+                if web:
+                    metadata["url"] = page["url"]
+                else:
+                    metadata["page"] = page["page"]
+
+                yield {"id": chunk_id, "text": chunk, "metadata": metadata}
+
+    return chunk_stage
+
+
+def embed_stage(records: Iterator) -> Iterator[Dict]:
+    buf: List[Dict] = []
+    tokens = 0
+    since = 0.0
+
+    def flush():
+        vectors = embed_chunks([r["text"] for r in buf])
+        out = [
+            {"id": r["id"], "values": v, "metadata": r["metadata"]}
+            for r, v in zip(buf, vectors)
+        ]
+        buf.clear()
+        return out
+
+    for rec in records:
+        if rec is not _TICK:
+            if not buf:
+                since = time.monotonic()
+            buf.append(rec)
+            tokens += len(encoding.encode_ordinary(rec["text"]))
+
+        due = buf and (
+            tokens >= PIPELINE_EMBED_BATCH_TOKENS
+            or time.monotonic() - since >= PIPELINE_FLUSH_SEC
+        )
+        if due:
+            yield from flush()
+            tokens = 0
+
+    if buf:
+        yield from flush()
+
+
+def upsert_vectors(userId: str):
+    def upsert_stage(vectors: Iterator) -> Iterator[int]:
+        pinecone = get_pinecone_repo()
+        buf: List[Dict] = []
+        since = 0.0
+
+        for v in vectors:
+            if v is not _TICK:
+                if not buf:
+                    since = time.monotonic()
+                buf.append(v)
+
+            due = buf and (
+                len(buf) >= PIPELINE_UPSERT_BATCH
+                or time.monotonic() - since >= PIPELINE_FLUSH_SEC
+            )
+            if due:
+                offload_texts(userId, buf)
+                pinecone.upsert(userId=userId, vectors=buf)
+                yield len(buf)
+                buf = []
+
+        if buf:
+            offload_texts(userId, buf)
+            pinecone.upsert(userId=userId, vectors=buf)
+            yield len(buf)
+
+    return upsert_stage
+
+
+def _run(
+    userId: str,
+    pages: Iterable[Dict],
+    deduper: Optional[JobDeduper] = None,
+) -> int:
+    counts = run_pipeline(pages, [
+        (chunk_pages(userId, deduper), False),
+        (embed_stage, True),
+        (upsert_vectors(userId), True),
+    ])
+    return sum(counts)
+
+
+# --------------------------------------------------
+# Entry points
+# --------------------------------------------------
+def ingest_web_streaming(
+    *,
+    userId: str,
+    url: str,
+    max_pages: int,
+    max_depth: int,
+    on_page: Optional[Callable[[int], None]] = None,
+) -> Dict[str, int]:
+    """
+    crawl → dedup → chunk → embed → upsert, all stages running at once.
+    """
+    stats = {"pages": 0, "chunks": 0}
+    deduper = new_job_deduper()
+
+    def pages():
+        crawl = iter_crawl(
+            url,
+            max_pages=max_pages,
+            max_depth=max_depth,
+            on_page=on_page,
+        )
+        try:
+            for page in crawl:
+                stats["pages"] += 1
+                page = {
+                    "sourceType": "web",
+                    "url": page["url"],
+                    "text": page["text"],
+                }
+                if deduper is not None:
+                    page = deduper.filter_page(page)
+                if page is not None:
+                    yield page
+        finally:
+            crawl.close()
+
+    stats["chunks"] = _run(userId, pages(), deduper)
+    if deduper is not None:
+        stats["dedup"] = deduper.saved
+    return stats
+
+
+def ingest_pdf_streaming(*, userId: str, pdf_path: str) -> Dict:
+    """
+    extract (+OCR) → chunk → embed → upsert, all stages running at once.
+    Chunks never span pages, so `page` metadata is exact.
+    """
+    stats = {"pages": 0, "chunks": 0, "ocr_pages": []}
+
+    def pages():
+        for page_num, text, used_ocr in iter_pages(pdf_path):
+            stats["pages"] += 1
+            if used_ocr:
+                stats["ocr_pages"].append(page_num)
+            yield {"sourceType": "pdf", "page": page_num, "text": text}
+
+    stats["chunks"] = _run(userId, pages())
+    return stats
@@ -0,0 +1,164 @@
+# app/services/retrieval.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from app.metrics import stage_timer
+from app.repos.chunk_store import get_chunk_store
+from app.repos.pinecone_repo import get_pinecone_repo
+from app.services.embeddings import emb
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 2048))
+QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", 60 * 60))
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", 8))
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU + TTL cache of query embeddings.
+    """
+
+    def __init__(
+        self,
+        max_size: int = QUERY_CACHE_SIZE,
+        ttl: int = QUERY_CACHE_TTL_SECONDS,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: OrderedDict = OrderedDict()   # question → (ts, vector)
+
+    def get(self, question: str) -> Optional[List[float]]:
+        with self.lock:
+            hit = self.entries.get(question)
+            if hit is None:
+                return None
+            ts, vector = hit
+            if time.monotonic() - ts > self.ttl:
+                del self.entries[question]
+                return None
+            self.entries.move_to_end(question)
+            return vector
+
+    def put(self, question: str, vector: List[float]):
+        with self.lock:
+            self.entries[question] = (time.monotonic(), vector)
+            self.entries.move_to_end(question)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+query_cache = QueryEmbeddingCache()
+_query_pool = ThreadPoolExecutor(
+    max_workers=QUERY_CONCURRENCY,
+    thread_name_prefix="pinecone-query",
+)
+
+
+def embed_queries(questions: List[str]) -> List[List[float]]:
+    """
+    Cached query embeddings; all misses go out in ONE embedding call.
+    """
+    keys = [" ".join(q.split()) for q in questions]
+    vectors: Dict[str, List[float]] = {}
+
+    for k in keys:
+        cached = query_cache.get(k)
+        if cached is not None:
+            vectors[k] = cached
+
+    missing = list(dict.fromkeys(k for k in keys if k not in vectors))
+    if missing:
+        for k, v in zip(missing, emb.embed_documents(missing)):
+            query_cache.put(k, v)
+            vectors[k] = v
+
+    return [vectors[k] for k in keys]
+
+
+def build_filter(
+    sourceType: Optional[str] = None,
+    url: Optional[str] = None,
+    page: Optional[int] = None,
+) -> Optional[Dict]:
+    clauses = {
+        k: {"$eq": v}
+        for k, v in (("sourceType", sourceType), ("url", url), ("page", page))
+        if v is not None
+    }
+    return clauses or None
+
+
+def _to_matches(res) -> List[Dict]:
+    matches = []
+    for m in res.matches or []:
+        meta = m.metadata or {}
+        page = meta.get("page")
+        matches.append({
+            "id": m.id,
+            "score": m.score,
+            "text": meta.get("text"),
+            "sourceType": meta.get("sourceType"),
+            "url": meta.get("url"),
+            "page": int(page) if page is not None else None,
+        })
+    return matches
+
+
+def hydrate_texts(userId: str, results: List[List[Dict]]) -> List[List[Dict]]:
+    """
+    Fills match text from the chunk store, one bulk read for all
+    questions. Vectors written before the store still carry their text.
+    """
+    store = get_chunk_store()
+    if store is None:
+        return results
+
+    missing = list(dict.fromkeys(
+        m["id"] for matches in results for m in matches if m["text"] is None
+    ))
+    if not missing:
+        return results
+
+    with stage_timer("hydrate"):
+        texts = store.get_many(userId, missing)
+
+    for matches in results:
+        for m in matches:
+            if m["text"] is None:
+                m["text"] = texts.get(m["id"])
+
+    return results
+
+
+def search(
+    *,
+    userId: str,
+    questions: List[str],
+    top_k: int = 6,
+    metadata_filter: Optional[Dict] = None,
+) -> List[List[Dict]]:
+    """
+    Embeds all questions at once, then queries the user namespace
+    concurrently. Results are in question order, text hydrated from
+    the chunk store when one is configured.
+    """
+    vectors = embed_queries(questions)
+    pinecone = get_pinecone_repo()
+
+    def _query(vector):
+        return _to_matches(pinecone.query(
+            userId=userId,
+            vector=vector,
+            top_k=top_k,
+            metadata_filter=metadata_filter,
+        ))
+
+    if len(vectors) == 1:
+        return hydrate_texts(userId, [_query(vectors[0])])
+
+    return hydrate_texts(userId, list(_query_pool.map(_query, vectors)))
@@ -1,15 +1,9 @@
 # app/repos/source_fetcher.py
 
-import requests
+import httpx
 from typing import Tuple
 
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-}
+from app.services.http_client import ResponseTooLarge, get_http_client
 
 # 25 MB safety limit
 MAX_DOWNLOAD_SIZE = 25 * 1024 * 1024
@@ -17,7 +11,7 @@ MAX_DOWNLOAD_SIZE = 25 * 1024 * 1024
 
 def fetch_source(source: str) -> Tuple[bytes, str]:
     """
-    Fetch raw content from a URL.
+    Fetch raw content from a URL (shared keep-alive client).
 
     Returns:
     - content bytes
@@ -28,27 +22,18 @@ def fetch_source(source: str) -> Tuple[bytes, str]:
         raise ValueError("source must be a non-empty string URL")
 
     try:
-        with requests.get(
+        resp = get_http_client().get(
             source,
+            max_bytes=MAX_DOWNLOAD_SIZE,
             timeout=30,
-            allow_redirects=True,
-            headers=HEADERS,
-            stream=True,
-        ) as resp:
-
-            resp.raise_for_status()
-
-            content_type = resp.headers.get("Content-Type", "").lower()
-
-            content = bytearray()
-            for chunk in resp.iter_content(chunk_size=8192):
-                if chunk:
-                    content.extend(chunk)
-
-                if len(content) > MAX_DOWNLOAD_SIZE:
-                    raise ValueError("Downloaded file exceeds size limit (25MB)")
+        )
+    except ResponseTooLarge:
+        raise ValueError("Downloaded file exceeds size limit (25MB)")
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Failed to fetch source: {e}")
 
-            return bytes(content), content_type
+    if resp.status >= 400:
+        raise RuntimeError(f"Failed to fetch source: HTTP {resp.status} for {resp.url}")
 
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"Failed to fetch source: {e}")
+    content_type = resp.headers.get("Content-Type", "").lower()
+    return resp.content, content_type
@@ -23,7 +23,7 @@ def resolve_source(source_url: str):
     # TIER 3: PDF
     # -------------------------
     if "application/pdf" in content_type or data.startswith(b"%PDF"):
-        texts, page_count, total_words, ocr_pages = extract_pages(data)
+        texts, _, page_count, total_words, ocr_pages = extract_pages(data)
         return {
             "text": "\n\n".join(texts),
             "sourceType": "pdf",
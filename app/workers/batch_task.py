@@ -0,0 +1,142 @@
+from typing import Dict, List, Tuple
+
+from celery import group
+
+from app.workers.celery import celery
+
+from app.crawlers.smart_crawler import base_origin, canonicalize_url, url_identity
+from app.workers.ingest_task import _ingest_logic
+from app.repos.redis_jobs import get_job_repo
+
+
+# --------------------------------------------------
+# Helper: canonicalize + dedupe + group by origin
+# --------------------------------------------------
+def plan_sources(sources: List[str]) -> Tuple[Dict[str, List[str]], int]:
+    """
+    Returns ({origin: [url, ...]}, duplicates dropped).
+    Order of first appearance is kept.
+    """
+    seen = set()
+    by_origin: Dict[str, List[str]] = {}
+
+    for raw in sources:
+        url = canonicalize_url(raw)
+        if not url or url_identity(url) in seen:
+            continue
+        seen.add(url_identity(url))
+        by_origin.setdefault(base_origin(url), []).append(url)
+
+    return by_origin, len(sources) - len(seen)
+
+
+# --------------------------------------------------
+# API side: parent + child jobs, one send for all groups
+# --------------------------------------------------
+def dispatch_batch(
+    *,
+    userId: str,
+    sources: List[str],
+    incremental: bool = False,
+    use_celery: bool = True,
+) -> Dict:
+    jobs = get_job_repo()
+
+    by_origin, duplicates = plan_sources(sources)
+    total = sum(len(urls) for urls in by_origin.values())
+    if not total:
+        raise ValueError("sources must contain at least one URL")
+
+    # Parent + every child in one round trip
+    parent, *children = jobs.create_many([userId] * (total + 1))
+    parentId = parent["jobId"]
+
+    groups = []
+    child_index = []
+    it = iter(children)
+    for origin, urls in by_origin.items():
+        items = [{"jobId": next(it)["jobId"], "source": u} for u in urls]
+        groups.append(items)
+        child_index.extend(items)
+
+    jobs.update(
+        parentId,
+        status="processing",
+        stage="dispatch",
+        total=total,
+        finished=0,
+        failed=0,
+        duplicates=duplicates,
+        children=child_index,
+    )
+
+    # One task per origin → sitemap fetched once per origin
+    signatures = [
+        ingest_source_group.s(
+            parentJobId=parentId,
+            userId=userId,
+            items=items,
+            incremental=incremental,
+        )
+        for items in groups
+    ]
+
+    if use_celery:
+        group(signatures).apply_async()   # single producer / connection
+    else:
+        for sig in signatures:
+            sig()
+
+    return {
+        "jobId": parentId,
+        "status": "queued",
+        "origins": len(groups),
+        "duplicates": duplicates,
+        "children": child_index,
+    }
+
+
+# --------------------------------------------------
+# Worker side: all sources of one origin
+# --------------------------------------------------
+@celery.task(
+    name="ingest_source_group",
+    queue="pinecone_queue",
+)
+def ingest_source_group(
+    *,
+    parentJobId: str,
+    userId: str,
+    items: List[Dict],
+    incremental: bool = False,
+):
+    jobs = get_job_repo()
+
+    for item in items:
+        try:
+            _ingest_logic(
+                item["jobId"],
+                userId,
+                item["source"],
+                incremental=incremental,
+                # Fan-out would return before the child job is done
+                allow_fanout=False,
+            )
+        except Exception:
+            # Child job already marked failed by _ingest_logic
+            jobs.incr(parentJobId, "failed")
+
+        finished = jobs.incr(parentJobId, "finished")
+        if finished is None:
+            continue
+
+        parent = jobs.get(parentJobId)
+        total = parent.get("total") or 1
+        jobs.progress(parentJobId, 100 * finished // total, stage="ingest")
+
+        if finished >= total:
+            if parent.get("failed", 0) >= total:
+                jobs.fail(parentJobId, "All sources failed")
+            else:
+                jobs.complete(parentJobId)
+                print(f"🎉 BATCH COMPLETED → {parentJobId}")
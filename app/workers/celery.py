@@ -1,6 +1,16 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 import os
 
+from app.metrics import (
+    CELERY_METRICS_PORT,
+    PROMETHEUS_MULTIPROC_DIR,
+    mark_process_dead,
+    start_exporter,
+)
+from app.services.http_client import shutdown_http_client
+from app.services.js_renderer import shutdown_browser_pool
+
 USE_CELERY = os.getenv("USE_CELERY", "false").lower() == "true"
 
 # -------------------------------------------------
@@ -38,7 +48,44 @@ else:
         task_default_queue="pinecone_queue",
     )
 
+# -------------------------------------------------
+# Worker lifecycle
+# -------------------------------------------------
+worker_process_shutdown.connect(shutdown_browser_pool)
+worker_process_shutdown.connect(shutdown_http_client)
+
+
+def _forks_children(worker) -> bool:
+    pool = getattr(worker, "pool_cls", None) or "prefork"
+    name = pool if isinstance(pool, str) else pool.__module__
+    return "prefork" in name or "processes" in name
+
+
+@worker_init.connect
+def _start_metrics_exporter(sender=None, **_):
+    # Main worker process only; prefork children write to
+    # PROMETHEUS_MULTIPROC_DIR and are aggregated here
+    if not CELERY_METRICS_PORT:
+        return
+    if not PROMETHEUS_MULTIPROC_DIR and _forks_children(sender):
+        # Tasks run in the children: this process's own registry
+        # would only ever show zeros
+        print(
+            "⚠️ Worker metrics disabled: prefork pool needs "
+            "PROMETHEUS_MULTIPROC_DIR (or run with --pool=solo/threads)"
+        )
+        return
+    start_exporter(CELERY_METRICS_PORT)
+    print(f"📈 Worker metrics on :{CELERY_METRICS_PORT}/metrics")
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_dead(pid=None, **_):
+    mark_process_dead(pid or os.getpid())
+
 # -------------------------------------------------
 # FORCE task registration
 # -------------------------------------------------
 import app.workers.ingest_task  # noqa: F401
+import app.workers.fanout_task  # noqa: F401
+import app.workers.batch_task  # noqa: F401
@@ -0,0 +1,141 @@
+import os
+from typing import Dict, List
+
+from celery import chord
+
+from app.workers.celery import celery
+
+from app.crawlers.smart_crawler import discover_urls, smart_crawl
+from app.services.embeddings import build_web_embeddings, new_job_deduper
+from app.repos.redis_jobs import get_job_repo
+from app.metrics import CHUNKS, JOBS, PAGES
+
+# Pages fetched + embedded per subtask
+CRAWL_FANOUT_BATCH = int(os.getenv("CRAWL_FANOUT_BATCH", 10))
+
+
+# --------------------------------------------------
+# Parent: discover → dispatch
+# --------------------------------------------------
+def dispatch_web_fanout(
+    *,
+    jobId: str,
+    userId: str,
+    url: str,
+    max_pages: int,
+) -> int:
+    """
+    Discovers URLs (seeds, sitemap, root outlinks) and fans page batches
+    out over pinecone_queue. The chord callback completes the job.
+
+    A separate crawl mode, not a faster copy of the single-worker one:
+    only the discovered URLs are fetched (links are not followed past
+    the root page) and dedup runs per batch, not per job.
+
+    Returns number of subtasks dispatched.
+    """
+    jobs = get_job_repo()
+
+    urls = discover_urls(url, max_pages=max_pages)
+    if not urls:
+        raise ValueError("No URLs discovered")
+
+    batches = [
+        urls[i:i + CRAWL_FANOUT_BATCH]
+        for i in range(0, len(urls), CRAWL_FANOUT_BATCH)
+    ]
+
+    jobs.update(
+        jobId,
+        stage="crawl",
+        progress=25,
+        batches=len(batches),
+        batchesDone=0,
+    )
+
+    header = [
+        ingest_page_batch.s(jobId=jobId, userId=userId, rootUrl=url, urls=b)
+        for b in batches
+    ]
+    chord(header)(finalize_web_fanout.s(jobId=jobId))
+
+    return len(batches)
+
+
+# --------------------------------------------------
+# Subtask: fetch + extract + embed one batch of pages
+# --------------------------------------------------
+@celery.task(
+    name="ingest_page_batch",
+    queue="pinecone_queue",
+)
+def ingest_page_batch(
+    *,
+    jobId: str,
+    userId: str,
+    rootUrl: str,
+    urls: List[str],
+) -> Dict:
+    jobs = get_job_repo()
+
+    try:
+        pages = smart_crawl(
+            rootUrl,
+            max_pages=len(urls),
+            max_depth=0,
+            seeds=urls,
+        )
+        # Dedup is per batch (no state shared between workers)
+        deduper = new_job_deduper()
+        counts = build_web_embeddings(userId=userId, pages=pages, deduper=deduper)
+        result = {"pages": len(pages), "chunks": sum(counts.values())}
+        if deduper is not None:
+            result["dedup"] = deduper.saved
+        PAGES.labels(source_type="web").inc(result["pages"])
+        CHUNKS.labels(source_type="web").inc(result["chunks"])
+    except Exception as e:
+        print(f"❌ Page batch failed ({jobId}): {e}")
+        result = {"pages": 0, "chunks": 0, "error": str(e)}
+
+    done = jobs.incr(jobId, "batchesDone")
+    total = jobs.get(jobId).get("batches") or 1
+    if done is not None:
+        jobs.progress(jobId, 25 + 70 * done // total, stage="crawl")
+
+    return result
+
+
+# --------------------------------------------------
+# Chord callback: roll results up into the job
+# --------------------------------------------------
+@celery.task(
+    name="finalize_web_fanout",
+    queue="pinecone_queue",
+)
+def finalize_web_fanout(results: List[Dict], *, jobId: str):
+    jobs = get_job_repo()
+
+    errors = [r["error"] for r in results if r.get("error")]
+    result = {
+        "pages": sum(r["pages"] for r in results),
+        "chunks": sum(r["chunks"] for r in results),
+        "failedBatches": len(errors),
+    }
+
+    # Same `dedup` record as the single-worker / pipeline paths
+    # (summed over batches; each batch deduplicates on its own)
+    dedups = [r["dedup"] for r in results if r.get("dedup")]
+    if dedups:
+        jobs.update(jobId, dedup={
+            k: sum(d.get(k, 0) for d in dedups) for k in dedups[0]
+        })
+
+    if not result["pages"]:
+        JOBS.labels(source_type="web", outcome="error").inc()
+        jobs.fail(jobId, errors[0] if errors else "No usable web content extracted")
+        return result
+
+    JOBS.labels(source_type="web", outcome="ok").inc()
+    jobs.complete(jobId, result=result)
+    print(f"🎉 FAN-OUT JOB COMPLETED → {result}")
+    return result
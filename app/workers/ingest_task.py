@@ -1,10 +1,32 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
 from app.workers.celery import celery
 
 from app.services.source_fetcher import fetch_source
-from app.services.pdf_extractor import extract_pages
+from app.services.pdf_extractor import extract_pages_from_path
 from app.crawlers.smart_crawler import smart_crawl
-from app.services.embeddings import build_embeddings
+from app.services.embeddings import (
+    build_embeddings,
+    build_web_embeddings,
+    new_job_deduper,
+)
+from app.services.incremental import sync_web_pages
+from app.services.pipeline import ingest_pdf_streaming, ingest_web_streaming
+from app.workers.fanout_task import dispatch_web_fanout
+from app.repos.crawl_state import get_crawl_state_repo
 from app.repos.redis_jobs import get_job_repo
+from app.repos.blob_store import get_blob_store
+from app.metrics import CHUNKS, JOBS, PAGES, stage_timer
+
+# Overlap fetch/extract, chunk, embed and upsert (bounded queues)
+INGEST_PIPELINE = os.getenv("INGEST_PIPELINE", "false").lower() == "true"
+
+# Fan page batches out to other workers (chord joins them). A separate
+# mode: indexes the root page's outlinks + seeds + sitemap only (no deeper
+# link following) with per-batch dedup; see dispatch_web_fanout
+DISTRIBUTED_CRAWL = os.getenv("DISTRIBUTED_CRAWL", "false").lower() == "true"
 
 
 # --------------------------------------------------
@@ -18,6 +40,43 @@ def detect_pdf(url: str, content_type: str) -> bool:
     return clean_url.endswith(".pdf")
 
 
+# --------------------------------------------------
+# Helper: PDF on disk (blob in place, bytes → temp file)
+# --------------------------------------------------
+@contextmanager
+def _pdf_file(content, blobRef):
+    if blobRef:
+        with get_blob_store().local_path(blobRef) as pdf_path:
+            yield pdf_path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        f.write(content)
+        f.flush()
+        yield f.name
+
+
+# --------------------------------------------------
+# Helper: PDF soft fail (do NOT raise)
+# --------------------------------------------------
+def _skip_no_text(jobs, jobId, pages, ocr_pages):
+    print("⚠️ No usable text found in PDF (even after OCR)")
+    JOBS.labels(source_type="pdf", outcome="skipped").inc()
+    jobs.complete(
+        jobId,
+        meta={
+            "status": "skipped",
+            "reason": "no_text_after_ocr",
+            "pages": pages,
+            "ocr_pages": ocr_pages,
+        },
+    )
+    return {
+        "status": "skipped",
+        "reason": "no_text_after_ocr",
+    }
+
+
 # --------------------------------------------------
 # Core ingestion logic
 # --------------------------------------------------
@@ -25,13 +84,24 @@ def _ingest_logic(
     jobId: str,
     userId: str,
     source,
+    incremental: bool = False,
+    blobRef: str = None,
+    allow_fanout: bool = True,
 ):
+    """
+    allow_fanout=False keeps a web crawl on this worker even with
+    DISTRIBUTED_CRAWL (callers that must see the job finish on return,
+    e.g. batch source groups).
+    """
     print("\n🚀 INGEST STARTED")
     print("jobId:", jobId)
     print("userId:", userId)
     print("source type:", type(source))
+    print("blobRef:", blobRef)
+    print("incremental:", incremental)
 
     jobs = get_job_repo()
+    source_type = "unknown"
 
     try:
         # -------------------------
@@ -48,13 +118,15 @@ def _ingest_logic(
         # -------------------------
         # Validate source
         # -------------------------
-        if source is None:
-            raise ValueError("source is required")
+        is_blob = bool(blobRef)
+
+        if source is None and not is_blob:
+            raise ValueError("source or blobRef is required")
 
         is_bytes = isinstance(source, (bytes, bytearray))
         is_url = isinstance(source, str) and source.strip()
 
-        if not is_bytes and not is_url:
+        if not is_blob and not is_bytes and not is_url:
             raise ValueError("source must be either a URL string or PDF bytes")
 
         url = source.strip() if is_url else None
@@ -62,105 +134,195 @@ def _ingest_logic(
         # -------------------------
         # FETCH SOURCE
         # -------------------------
-        if is_bytes:
+        if is_blob:
+            print("📄 Using uploaded PDF blob")
+            content = None
+            content_type = "application/pdf"
+        elif is_bytes:
             print("📄 Using uploaded PDF bytes")
             content = source
             content_type = "application/pdf"
         else:
             print("🌐 Fetching URL:", url)
-            content, content_type = fetch_source(url)
+            with stage_timer("source_fetch"):
+                content, content_type = fetch_source(url)
 
         print("content_type:", content_type)
 
         is_pdf = detect_pdf(url, content_type)
         print("is_pdf:", is_pdf)
+        source_type = "pdf" if is_pdf else "web"
 
         # ==================================================
         # PDF INGESTION
         # ==================================================
         if is_pdf:
-            print("📄 START PDF EXTRACTION")
-            jobs.update(jobId, stage="extract", progress=25)
-
-            texts, pages, total_words, ocr_pages = extract_pages(content)
-
-            print(
-                f"📄 PDF extracted → pages={pages}, "
-                f"words={total_words}, ocr_pages={ocr_pages}"
-            )
-
-            # ❗ SOFT FAIL (do NOT raise)
-            if not texts:
-                print("⚠️ No usable text found in PDF (even after OCR)")
-                jobs.complete(
-                    jobId,
-                    meta={
-                        "status": "skipped",
-                        "reason": "no_text_after_ocr",
-                        "pages": pages,
-                        "ocr_pages": ocr_pages,
-                    },
+            if INGEST_PIPELINE:
+                print("🚰 START PIPELINED PDF INGEST")
+                jobs.update(jobId, stage="pipeline", progress=25)
+
+                with _pdf_file(content, blobRef) as pdf_path, \
+                        stage_timer("pipeline"):
+                    stats = ingest_pdf_streaming(
+                        userId=userId,
+                        pdf_path=pdf_path,
+                    )
+
+                print(f"✅ PIPELINE DONE (PDF) → {stats}")
+                PAGES.labels(source_type="pdf").inc(stats["pages"])
+                CHUNKS.labels(source_type="pdf").inc(stats["chunks"])
+
+                if not stats["pages"]:
+                    return _skip_no_text(jobs, jobId, None, stats["ocr_pages"])
+
+            else:
+                print("📄 START PDF EXTRACTION")
+                jobs.update(jobId, stage="extract", progress=25)
+
+                with _pdf_file(content, blobRef) as pdf_path, \
+                        stage_timer("pdf_extract"):
+                    texts, page_nums, pages, total_words, ocr_pages = (
+                        extract_pages_from_path(pdf_path)
+                    )
+                PAGES.labels(source_type="pdf").inc(len(texts))
+
+                print(
+                    f"📄 PDF extracted → pages={pages}, "
+                    f"words={total_words}, ocr_pages={ocr_pages}"
                 )
-                return {
-                    "status": "skipped",
-                    "reason": "no_text_after_ocr",
-                }
 
-            print("🧠 START EMBEDDINGS (PDF)")
-            jobs.update(jobId, stage="embed", progress=60)
+                if not texts:
+                    return _skip_no_text(jobs, jobId, pages, ocr_pages)
 
-            build_embeddings(
-                userId=userId,
-                texts=texts,
-                sourceType="pdf",
-                pages=list(range(1, len(texts) + 1)),  # ✅ align with actual texts
-            )
+                print("🧠 START EMBEDDINGS (PDF)")
+                jobs.update(jobId, stage="embed", progress=60)
 
-            print("✅ EMBEDDINGS DONE (PDF)")
+                with stage_timer("index"):
+                    chunks = build_embeddings(
+                        userId=userId,
+                        texts=texts,
+                        sourceType="pdf",
+                        pages=page_nums,
+                    )
 
+                print("✅ EMBEDDINGS DONE (PDF)")
+                CHUNKS.labels(source_type="pdf").inc(chunks or 0)
 
         # ==================================================
         # WEB INGESTION
         # ==================================================
         else:
-            print("🌐 START SMART WEB CRAWL")
-            jobs.update(jobId, stage="crawl", progress=25)
-
-            pages = smart_crawl(
-                url,
-                max_pages=100,
-                max_depth=5,
-            )
+            max_pages = 100
 
-            if not pages:
-                raise ValueError("No usable web content extracted")
+            def on_page(n):
+                jobs.progress(jobId, 25 + 35 * n // max_pages, stage="crawl")
 
-            print(f"🌐 Pages crawled: {len(pages)}")
+            if DISTRIBUTED_CRAWL and allow_fanout and not incremental:
+                print("🪓 START DISTRIBUTED WEB INGEST")
+                jobs.update(jobId, stage="discover", progress=15)
 
-            print("🧠 START EMBEDDINGS (WEB)")
-            jobs.update(jobId, stage="embed", progress=60)
-
-            for idx, page in enumerate(pages):
-                print(f"🔹 Embedding page {idx + 1}/{len(pages)} → {page['url']}")
-
-                build_embeddings(
+                batches = dispatch_web_fanout(
+                    jobId=jobId,
                     userId=userId,
-                    texts=[page["text"]],
-                    sourceType="web",
-                    url=page["url"],
-                    chunkId=f"web-{idx}",
+                    url=url,
+                    max_pages=max_pages,
                 )
 
-            print("✅ EMBEDDINGS DONE (WEB)")
+                # Job is completed by the chord callback
+                print(f"🪓 Dispatched {batches} page batches")
+                JOBS.labels(source_type="web", outcome="dispatched").inc()
+                return {"status": "dispatched", "batches": batches}
+
+            if INGEST_PIPELINE and not incremental:
+                print("🚰 START PIPELINED WEB INGEST")
+                jobs.update(jobId, stage="crawl", progress=25)
+
+                with stage_timer("pipeline"):
+                    stats = ingest_web_streaming(
+                        userId=userId,
+                        url=url,
+                        max_pages=max_pages,
+                        max_depth=5,
+                        on_page=on_page,
+                    )
+
+                if not stats["pages"]:
+                    raise ValueError("No usable web content extracted")
+
+                print(f"✅ PIPELINE DONE (WEB) → {stats}")
+                if "dedup" in stats:
+                    jobs.update(jobId, dedup=stats["dedup"])
+                PAGES.labels(source_type="web").inc(stats["pages"])
+                CHUNKS.labels(source_type="web").inc(stats["chunks"])
+
+            else:
+                print("🌐 START SMART WEB CRAWL")
+                jobs.update(jobId, stage="crawl", progress=25)
+
+                prior = (
+                    get_crawl_state_repo().load(userId, url)
+                    if incremental else None
+                )
+
+                with stage_timer("crawl"):
+                    pages = smart_crawl(
+                        url,
+                        max_pages=max_pages,
+                        max_depth=5,
+                        prior=prior,
+                        on_page=on_page,
+                    )
+
+                # gone / error entries are known pages, not content
+                kept = sum(
+                    p.get("status") not in ("gone", "error") for p in pages
+                )
+                if not any(p.get("status") != "error" for p in pages):
+                    raise ValueError("No usable web content extracted")
+
+                print(f"🌐 Pages crawled: {kept}")
+                PAGES.labels(source_type="web").inc(kept)
+
+                print("🧠 START EMBEDDINGS (WEB)")
+                jobs.update(jobId, stage="embed", progress=60)
+
+                deduper = new_job_deduper()
+
+                with stage_timer("index"):
+                    if incremental:
+                        stats = sync_web_pages(
+                            userId=userId,
+                            source=url,
+                            pages=pages,
+                            prior=prior,
+                            truncated=kept >= max_pages,
+                            deduper=deduper,
+                        )
+                        chunks = stats["chunks"]
+                        print(f"✅ EMBEDDINGS DONE (WEB, incremental) → {stats}")
+                    else:
+                        counts = build_web_embeddings(
+                            userId=userId,
+                            pages=pages,
+                            deduper=deduper,
+                        )
+                        chunks = sum(counts.values())
+                        print(f"✅ EMBEDDINGS DONE (WEB) → chunks={chunks}")
+
+                CHUNKS.labels(source_type="web").inc(chunks)
+                if deduper is not None:
+                    jobs.update(jobId, dedup=deduper.saved)
 
         # -------------------------
         # COMPLETE JOB
         # -------------------------
         jobs.complete(jobId)
+        JOBS.labels(source_type=source_type, outcome="ok").inc()
         print("🎉 JOB COMPLETED")
 
     except Exception as e:
         print("❌ INGEST FAILED:", str(e))
+        JOBS.labels(source_type=source_type, outcome="error").inc()
         jobs.fail(jobId, str(e))
         raise
 
@@ -182,7 +344,9 @@ def ingest_document(self=None, *args, **kwargs):
         return _ingest_logic(
             kwargs["jobId"],
             kwargs["userId"],
-            kwargs["source"],
+            kwargs.get("source"),
+            incremental=kwargs.get("incremental", False),
+            blobRef=kwargs.get("blobRef"),
         )
 
     if len(args) == 3:
@@ -0,0 +1,129 @@
+"""
+Chunking a large PDF-like document: LangChain character splitter
+(previous) vs TokenChunker.
+
+    python -m benchmarks.bench_chunker [--pages 1000] [--repeat 3]
+
+Reports time, chunk count, tokens per chunk and how many chunks carry
+the right page (previous code used the chunk index as the page).
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import List
+
+import tiktoken
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.chunker import TokenChunker
+
+EMBED_MODEL = "text-embedding-3-small"
+
+WORDS = (
+    "pinecone vector index crawl embed chunk token latency batch query "
+    "worker queue redis celery document page section article content "
+    "retrieval answer source upload parse render sitemap origin"
+).split()
+
+
+def make_pages(n: int, seed: int = 3) -> List[str]:
+    """
+    Page text that starts with a tag naming its page (for attribution).
+    """
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n):
+        paras = []
+        for _ in range(rng.randint(3, 8)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18)))
+                .capitalize() + "."
+                for _ in range(rng.randint(2, 6))
+            ]
+            paras.append(" ".join(sentences))
+        pages.append(f"[page {i + 1}]\n" + "\n\n".join(paras))
+    return pages
+
+
+def baseline(pages: List[str], encoding):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1600,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", " ", ""],
+    )
+    chunks = splitter.split_text("\n".join(pages))
+    tokens = [len(t) for t in encoding.encode_ordinary_batch(chunks)]
+    # previous attribution: pages[i] for chunk i
+    attributed = [i + 1 if i < len(pages) else None for i in range(len(chunks))]
+    return chunks, tokens, attributed
+
+
+def token_chunker(pages: List[str], chunker: TokenChunker):
+    chunks = chunker.chunk(pages)
+    return (
+        [c.text for c in chunks],
+        [c.tokens for c in chunks],
+        [c.source + 1 for c in chunks],
+    )
+
+
+def correct_pages(chunks: List[str], attributed: List, pages: List[str]) -> int:
+    """
+    A chunk's page is right if the chunk's first words occur on it.
+    """
+    ok = 0
+    for text, page in zip(chunks, attributed):
+        if page is None:
+            continue
+        probe = text[:60]
+        if probe in pages[page - 1] or pages[page - 1].endswith(probe[:20]):
+            ok += 1
+    return ok
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def describe(name: str, seconds: float, chunks, tokens, correct: int):
+    print(
+        f"{name:<16} {seconds:7.3f}s  chunks={len(chunks):>5}  "
+        f"tokens min/mean/max={min(tokens)}/{statistics.mean(tokens):.0f}/"
+        f"{max(tokens)} (stdev {statistics.pstdev(tokens):.1f})  "
+        f"page ok={correct}/{len(chunks)}"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    encoding = tiktoken.encoding_for_model(EMBED_MODEL)
+    chunker = TokenChunker(encoding)
+
+    pages = make_pages(args.pages)
+    print(f"pages: {len(pages)}  chars: {sum(map(len, pages)):,}\n")
+
+    lc = baseline(pages, encoding)
+    tc = token_chunker(pages, chunker)
+
+    # LangChain timing includes the token count the embed step needs anyway
+    t_lc = best_of(lambda: baseline(pages, encoding), args.repeat)
+    t_tc = best_of(lambda: token_chunker(pages, chunker), args.repeat)
+
+    describe("langchain 1600c", t_lc, lc[0], lc[1], correct_pages(lc[0], lc[2], pages))
+    describe(f"tiktoken {chunker.chunk_tokens}t", t_tc, tc[0], tc[1],
+             correct_pages(tc[0], tc[2], pages))
+    print(f"\nspeedup: {t_lc / t_tc:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Embedding size vs cost: 1536 / 768 / 512 dimensions.
+
+    python -m benchmarks.bench_dimensions [--chunks 5000] [--queries 200]
+
+Per size, for `--chunks` vectors:
+- memory held by the pipeline: list of Python floats (previous) vs one
+  float32 array
+- upsert payload: serialized JSON bytes and request count after
+  batch_by_payload
+- query latency: exact top-k over all vectors (what the index has to
+  compute per query; Pinecone adds its own network / ANN overhead)
+
+Vectors are random unit vectors; retrieval quality at a reduced size
+has to be checked on real data (text-embedding-3 `dimensions`).
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List
+
+import numpy as np
+
+from app.repos.pinecone_repo import batch_by_payload, to_values
+
+DIMENSIONS = (1536, 768, 512)
+TOP_K = 6
+
+
+def unit_vectors(n: int, dims: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    v = rng.standard_normal((n, dims), dtype=np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    return v
+
+
+def list_memory_mb(matrix: np.ndarray) -> float:
+    """
+    Bytes allocated to hold the vectors as lists of Python floats.
+    """
+    tracemalloc.start()
+    as_lists = matrix.tolist()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del as_lists
+    return size / 1e6
+
+
+def upsert_payload(matrix: np.ndarray) -> Dict:
+    vectors = [
+        {
+            "id": f"chunk_{i}",
+            "values": row,
+            "metadata": {"userId": "bench", "sourceType": "pdf", "page": i},
+        }
+        for i, row in enumerate(matrix)
+    ]
+    batches = batch_by_payload(vectors)
+    sent = sum(
+        len(json.dumps(
+            {"vectors": [{**v, "values": to_values(v["values"])} for v in b]},
+            separators=(",", ":"),
+        ))
+        for b in batches
+    )
+    return {"requests": len(batches), "bytes": sent}
+
+
+def query_latency_ms(matrix: np.ndarray, queries: np.ndarray) -> List[float]:
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        scores = matrix @ q
+        top = np.argpartition(scores, -TOP_K)[-TOP_K:]
+        top = top[np.argsort(scores[top])[::-1]]
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--chunks", type=int, default=5_000)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+
+    print(f"chunks: {args.chunks:,}  queries: {args.queries}\n")
+    print(
+        f"{'dims':>5}  {'lists MB':>9}  {'float32 MB':>10}  "
+        f"{'upsert MB':>9}  {'requests':>8}  {'query p50':>9}  {'p95':>7}"
+    )
+
+    for dims in DIMENSIONS:
+        matrix = unit_vectors(args.chunks, dims)
+        queries = unit_vectors(args.queries, dims, seed=11)
+
+        lists_mb = list_memory_mb(matrix)
+        payload = upsert_payload(matrix)
+        latency = sorted(query_latency_ms(matrix, queries))
+
+        print(
+            f"{dims:>5}  {lists_mb:>9.1f}  {matrix.nbytes / 1e6:>10.1f}  "
+            f"{payload['bytes'] / 1e6:>9.1f}  {payload['requests']:>8}  "
+            f"{statistics.median(latency):>7.2f}ms  "
+            f"{latency[int(len(latency) * 0.95)]:>5.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
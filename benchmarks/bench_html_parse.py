@@ -0,0 +1,187 @@
+"""
+HTML processing per crawled page: BeautifulSoup (3 parses) vs lxml
+parse_page (1 parse).
+
+    python -m benchmarks.bench_html_parse [--pages 200] [--repeat 3] [files...]
+
+Without files, synthetic pages of mixed size are generated.
+"""
+import argparse
+import random
+import time
+from typing import List, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from app.crawlers.smart_crawler import (
+    canonicalize_url,
+    clean_text,
+    parse_page,
+    same_domain,
+    should_skip_url,
+)
+
+ROOT = "https://example.com"
+
+
+# --------------------------------------------------
+# Baseline: previous BeautifulSoup helpers
+# --------------------------------------------------
+def bs4_extract_main_text(html: str) -> Tuple[str, str]:
+    soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(["script", "style", "noscript", "svg"]):
+        tag.decompose()
+    for tag in soup(["header", "footer", "nav", "aside"]):
+        tag.decompose()
+
+    title = clean_text(soup.title.get_text(" ")) if soup.title else ""
+
+    main = soup.find("main") or soup.find("article")
+    if main:
+        text = clean_text(main.get_text(" "))
+    else:
+        text = clean_text(soup.get_text(" "))
+
+    return title, text
+
+
+def bs4_extract_links(current_url: str, html: str, root_url: str) -> List[str]:
+    soup = BeautifulSoup(html, "html.parser")
+    links = set()
+
+    for a in soup.select("a[href]"):
+        href = (a.get("href") or "").strip()
+        if not href:
+            continue
+        abs_url = canonicalize_url(urljoin(current_url, href))
+        if (
+            abs_url.startswith(("http://", "https://"))
+            and same_domain(root_url, abs_url)
+            and not should_skip_url(abs_url)
+        ):
+            links.add(abs_url)
+
+    return list(links)
+
+
+def bs4_looks_like_js_shell(html: str) -> bool:
+    if not html or len(html) < 2000:
+        return True
+
+    markers = ["id=\"root\"", "id=\"app\"", "__next", "react", "vite", "webpack"]
+    score = sum(m in html.lower() for m in markers)
+
+    soup = BeautifulSoup(html, "html.parser")
+    body_text = clean_text(
+        soup.body.get_text(" ") if soup.body else soup.get_text(" ")
+    )
+
+    return score >= 2 or len(body_text) < 200
+
+
+def baseline(html: str, url: str) -> dict:
+    js_shell = bs4_looks_like_js_shell(html)
+    title, text = bs4_extract_main_text(html)
+    links = bs4_extract_links(url, html, ROOT)
+    return {"js_shell": js_shell, "title": title, "text": text, "links": links}
+
+
+def single_pass(html: str, url: str) -> dict:
+    return parse_page(html, url, ROOT)
+
+
+# --------------------------------------------------
+# Synthetic pages
+# --------------------------------------------------
+WORDS = (
+    "pinecone vector index crawl embed chunk token latency batch query "
+    "worker queue redis celery document page section article content"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))) + "."
+
+
+def make_page(rng: random.Random, i: int) -> str:
+    nav = "".join(
+        f'<li><a href="/section-{j}/">Section {j}</a></li>' for j in range(30)
+    )
+    body = "".join(
+        f"<h2>Heading {j}</h2>"
+        + "".join(f"<p>{_sentence(rng)} <a href='/p/{i}-{j}-{k}'>more</a></p>"
+                  for k in range(rng.randint(2, 8)))
+        for j in range(rng.randint(5, 40))
+    )
+    return (
+        "<!doctype html><html><head>"
+        f"<title>Page {i} &amp; friends</title>"
+        "<style>body{font-family:sans-serif}</style>"
+        "<script>window.dataLayer=[];function track(){}</script>"
+        "</head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><article>{body}</article></main>"
+        "<aside><p>Related links</p><a href='https://other.example/x'>x</a></aside>"
+        "<footer><p>© footer</p><a href='/terms.pdf'>terms</a></footer>"
+        "<script>track()</script></body></html>"
+    )
+
+
+def load_pages(args) -> List[Tuple[str, str]]:
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((f"{ROOT}/{path}", f.read()))
+        return pages
+
+    rng = random.Random(42)
+    return [(f"{ROOT}/page-{i}", make_page(rng, i)) for i in range(args.pages)]
+
+
+def run(fn, pages, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for url, html in pages:
+            fn(html, url)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("files", nargs="*")
+    args = ap.parse_args()
+
+    pages = load_pages(args)
+    mb = sum(len(h) for _, h in pages) / 1e6
+
+    # Same answers before timing anything
+    mismatches = 0
+    for url, html in pages:
+        a, b = baseline(html, url), single_pass(html, url)
+        if (
+            a["js_shell"] != b["js_shell"]
+            or a["title"] != b["title"]
+            or a["text"] != b["text"]
+            or set(a["links"]) != set(b["links"])
+        ):
+            mismatches += 1
+
+    t_bs4 = run(baseline, pages, args.repeat)
+    t_lxml = run(single_pass, pages, args.repeat)
+
+    print(f"pages:        {len(pages)} ({mb:.1f} MB)")
+    print(f"mismatches:   {mismatches}")
+    print(f"bs4 x3 parse: {t_bs4:.3f}s  ({len(pages) / t_bs4:.0f} pages/s)")
+    print(f"lxml x1:      {t_lxml:.3f}s  ({len(pages) / t_lxml:.0f} pages/s)")
+    print(f"speedup:      {t_bs4 / t_lxml:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
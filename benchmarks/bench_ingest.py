@@ -0,0 +1,370 @@
+"""
+Offline end-to-end ingestion benchmark.
+
+    python -m benchmarks.bench_ingest [--scenarios web,web_pipeline,pdf,pdf_pipeline]
+                                      [--pages 60] [--shell-pages 10]
+                                      [--embed-latency-ms 50] [--out results.json]
+
+    python -m benchmarks.bench_ingest --compare BASE.json NEW.json
+
+Everything runs locally: a fixture website, a generated PDF corpus, an
+OpenAI-compatible embedding server and an in-memory Pinecone index (see
+benchmarks/fixtures.py). Each scenario runs in its own subprocess so
+peak RSS is per scenario.
+
+Needs the tiktoken encoding in its cache (TIKTOKEN_CACHE_DIR) and, for
+the scanned PDFs, tesseract + poppler. JS-shell pages are rendered only
+if Playwright's Chromium is installed; otherwise render time is the
+cost of the failed attempt.
+"""
+import argparse
+import functools
+import inspect
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+SCENARIOS = ("web", "web_pipeline", "pdf", "pdf_pipeline")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BENCH_USER = "bench-user"
+
+
+# --------------------------------------------------
+# Stage timers
+# --------------------------------------------------
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def instrument(self, module, name: str, stage: str):
+        """
+        Replaces module.<name> with a timed wrapper (sync or async).
+        """
+        fn = getattr(module, name)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - t0)
+        else:
+            @functools.wraps(fn)
+            def timed(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - t0)
+
+        setattr(module, name, timed)
+
+    def report(self) -> Dict[str, Dict]:
+        return {
+            stage: summarize(samples)
+            for stage, samples in sorted(self.samples.items())
+        }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1,
+                   round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples: List[float]) -> Dict:
+    s = sorted(samples)
+    return {
+        "count": len(s),
+        "total_s": round(sum(s), 4),
+        "p50_ms": round(percentile(s, 50) * 1000, 2),
+        "p90_ms": round(percentile(s, 90) * 1000, 2),
+        "p99_ms": round(percentile(s, 99) * 1000, 2),
+        "max_ms": round(s[-1] * 1000, 2) if s else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss: KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --------------------------------------------------
+# Child process: one scenario
+# --------------------------------------------------
+def _setup_app(timer: StageTimer):
+    """
+    Imports the app against the stand-ins and instruments its stages.
+    """
+    from app.repos import pinecone_repo
+    from app.crawlers import smart_crawler
+    from app.services import embeddings, pdf_extractor
+    from benchmarks.fixtures import InMemoryIndex
+
+    repo = pinecone_repo.PineconeRepo.__new__(pinecone_repo.PineconeRepo)
+    repo.pid = os.getpid()
+    repo.index = InMemoryIndex()
+    pinecone_repo._REPO = repo
+
+    timer.instrument(smart_crawler, "fetch_html_async", "fetch")
+    timer.instrument(smart_crawler, "parse_page", "parse")
+    timer.instrument(smart_crawler, "render_js_page_async", "render")
+    timer.instrument(pdf_extractor, "ocr_pages", "ocr")
+    timer.instrument(embeddings, "chunk_texts", "chunk")
+    timer.instrument(embeddings, "_embed_uncached", "embed")
+    timer.instrument(pinecone_repo.PineconeRepo, "_upsert_batch", "upsert")
+
+    return repo.index
+
+
+def run_scenario(name: str, site_url: str, pdfs: List[str], max_pages: int) -> Dict:
+    timer = StageTimer()
+    index = _setup_app(timer)
+
+    from app.crawlers.smart_crawler import smart_crawl
+    from app.services.embeddings import build_embeddings, build_web_embeddings
+    from app.services.pdf_extractor import extract_pages_from_path
+    from app.services.pipeline import ingest_pdf_streaming, ingest_web_streaming
+
+    pages = 0
+    t0 = time.perf_counter()
+
+    if name == "web":
+        crawled = smart_crawl(site_url, max_pages=max_pages, max_depth=5)
+        pages = len(crawled)
+        t = time.perf_counter()
+        build_web_embeddings(userId=BENCH_USER, pages=crawled)
+        timer.record("embed_total", time.perf_counter() - t)
+
+    elif name == "web_pipeline":
+        stats = ingest_web_streaming(
+            userId=BENCH_USER,
+            url=site_url,
+            max_pages=max_pages,
+            max_depth=5,
+        )
+        pages = stats["pages"]
+
+    elif name == "pdf":
+        for path in pdfs:
+            t = time.perf_counter()
+            texts, page_nums, _, _, _ = extract_pages_from_path(path)
+            timer.record("extract", time.perf_counter() - t)
+            pages += len(texts)
+            if texts:
+                build_embeddings(
+                    userId=BENCH_USER,
+                    texts=texts,
+                    sourceType="pdf",
+                    pages=page_nums,
+                )
+
+    elif name == "pdf_pipeline":
+        for path in pdfs:
+            pages += ingest_pdf_streaming(userId=BENCH_USER, pdf_path=path)["pages"]
+
+    else:
+        raise ValueError(f"Unknown scenario: {name}")
+
+    wall = time.perf_counter() - t0
+    chunks = index.vector_count()
+
+    return {
+        "wall_s": round(wall, 3),
+        "pages": pages,
+        "chunks": chunks,
+        "pages_per_s": round(pages / wall, 2) if wall else 0.0,
+        "chunks_per_s": round(chunks / wall, 2) if wall else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": timer.report(),
+    }
+
+
+# --------------------------------------------------
+# Parent: fixtures + one subprocess per scenario
+# --------------------------------------------------
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_all(args) -> Dict:
+    from benchmarks.fixtures import EmbeddingServer, FixtureSite, make_pdf_corpus
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    results: Dict[str, Dict] = {}
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FixtureSite(pages=args.pages, shell_pages=args.shell_pages,
+                        latency_ms=args.site_latency_ms) as site, \
+            EmbeddingServer(latency_ms=args.embed_latency_ms) as embed:
+
+        pdfs = []
+        if any(s.startswith("pdf") for s in scenarios):
+            corpus = make_pdf_corpus(
+                tmp,
+                text_docs=args.pdf_docs,
+                text_pages=args.pdf_pages,
+                scanned_docs=args.scanned_docs,
+                scanned_pages=args.scanned_pages,
+            )
+            pdfs = [path for _, path in corpus]
+
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_API_BASE": f"{embed.url}/v1",
+            "PINECONE_API_KEY": "bench",
+            "PINECONE_HOST": "http://127.0.0.1:9",
+            "EMBED_CACHE_ENABLE": "false",
+            "USE_CELERY": "false",
+        }
+
+        for name in scenarios:
+            site_before, embed_before = site.requests, embed.requests
+            print(f"▶ {name} ...", file=sys.stderr)
+
+            proc = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.bench_ingest",
+                    "--child", name,
+                    "--site", site.url,
+                    "--max-pages", str(args.pages + args.shell_pages + 1),
+                    *sum((["--pdf", p] for p in pdfs), []),
+                ],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            if proc.returncode != 0:
+                results[name] = {"error": f"exit code {proc.returncode}"}
+                continue
+
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result["site_requests"] = site.requests - site_before
+            result["embed_requests"] = embed.requests - embed_before
+            results[name] = result
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {
+                k: v for k, v in vars(args).items()
+                if k not in ("child", "site", "pdf", "compare", "out")
+            },
+        },
+        "scenarios": results,
+    }
+
+
+# --------------------------------------------------
+# Compare two result files
+# --------------------------------------------------
+COMPARE_KEYS = ("wall_s", "pages_per_s", "chunks_per_s", "peak_rss_mb")
+
+
+def compare(base_path: str, new_path: str):
+    with open(base_path) as f:
+        base = json.load(f)["scenarios"]
+    with open(new_path) as f:
+        new = json.load(f)["scenarios"]
+
+    def delta(a, b) -> str:
+        return f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+
+    for name in sorted(set(base) & set(new)):
+        a, b = base[name], new[name]
+        if "error" in a or "error" in b:
+            continue
+        print(f"\n{name}")
+        for key in COMPARE_KEYS:
+            print(f"  {key:<14} {a[key]:>10} → {b[key]:>10}  {delta(a[key], b[key])}")
+        for stage in sorted(set(a["stages"]) & set(b["stages"])):
+            sa, sb = a["stages"][stage]["p90_ms"], b["stages"][stage]["p90_ms"]
+            print(f"  p90 {stage:<10} {sa:>10} → {sb:>10}  {delta(sa, sb)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--pages", type=int, default=60)
+    ap.add_argument("--shell-pages", type=int, default=10)
+    ap.add_argument("--site-latency-ms", type=float, default=5.0)
+    ap.add_argument("--embed-latency-ms", type=float, default=50.0)
+    ap.add_argument("--pdf-docs", type=int, default=4)
+    ap.add_argument("--pdf-pages", type=int, default=20)
+    ap.add_argument("--scanned-docs", type=int, default=1)
+    ap.add_argument("--scanned-pages", type=int, default=4)
+    ap.add_argument("--out")
+    ap.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+
+    # internal: child process
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--site", help=argparse.SUPPRESS)
+    ap.add_argument("--max-pages", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--pdf", action="append", default=[], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.child:
+        result = run_scenario(args.child, args.site, args.pdf, args.max_pages)
+        print(json.dumps(result))
+        return
+
+    report = run_all(args)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"ingest-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in report["scenarios"].items():
+        if "error" in r:
+            print(f"{name:<14} ERROR {r['error']}")
+            continue
+        print(
+            f"{name:<14} {r['pages']:>4} pages {r['chunks']:>5} chunks  "
+            f"{r['pages_per_s']:>7} pages/s {r['chunks_per_s']:>8} chunks/s  "
+            f"rss {r['peak_rss_mb']} MB"
+        )
+    print(f"\n💾 {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""
+Offline stand-ins for the ingestion benchmarks:
+
+- FixtureSite:     local website (static + JS-shell pages, sitemap.xml)
+- make_pdf_corpus: text PDFs and scanned (image-only) PDFs
+- EmbeddingServer: OpenAI-compatible /v1/embeddings, deterministic vectors
+- InMemoryIndex:   Pinecone Index stand-in (upsert / query / delete)
+"""
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+WORDS = (
+    "pinecone vector index crawl embed chunk token latency batch query "
+    "worker queue redis celery document page section article content "
+    "search retrieval answer source upload parse render sitemap origin"
+).split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng: random.Random, sentences: int = 5) -> str:
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+
+class _Server:
+    """
+    ThreadingHTTPServer on 127.0.0.1:<free port>, served from a thread.
+    """
+
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever,
+            name=type(self).__name__,
+            daemon=True,
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# --------------------------------------------------
+# Fixture website
+# --------------------------------------------------
+def _static_page(rng: random.Random, i: int, n_pages: int, n_shell: int) -> str:
+    links = "".join(
+        f'<li><a href="/docs/{rng.randrange(n_pages)}">Doc</a></li>'
+        for _ in range(8)
+    )
+    if n_shell:
+        links += f'<li><a href="/app/{rng.randrange(n_shell)}">App</a></li>'
+
+    sections = "".join(
+        f"<h2>Section {j}</h2><p>{paragraph(rng)}</p><p>{paragraph(rng)}</p>"
+        for j in range(rng.randint(3, 12))
+    )
+    return (
+        "<!doctype html><html><head>"
+        f"<title>Doc {i}</title>"
+        "<style>body{font-family:sans-serif}</style>"
+        "<script>window.dataLayer=[];</script>"
+        "</head><body>"
+        f"<header><nav><ul>{links}</ul></nav></header>"
+        f"<main><article><h1>Doc {i}</h1>{sections}</article></main>"
+        "<footer><p>Fixture site footer</p>"
+        '<a href="/assets/brochure.pdf">brochure</a></footer>'
+        "</body></html>"
+    )
+
+
+def _shell_page(rng: random.Random, i: int) -> str:
+    # Text only appears once the script has run (needs the JS renderer)
+    content = json.dumps(
+        f"<main><h1>App {i}</h1><p>{paragraph(rng, 12)}</p></main>"
+    )
+    return (
+        "<!doctype html><html><head>"
+        f"<title>App {i}</title>"
+        '<script src="/static/react.production.min.js"></script>'
+        "</head><body>"
+        '<div id="root"></div>'
+        f"<script>document.getElementById('root').innerHTML = {content};</script>"
+        "<!-- built with vite + webpack -->"
+        + "<!-- " + "x" * 2000 + " -->"
+        + "</body></html>"
+    )
+
+
+class FixtureSite(_Server):
+    """
+    /                 index linking to every doc
+    /docs/<n>         static pages
+    /app/<n>          JS shells (text rendered client-side)
+    /sitemap.xml      every page, with lastmod
+    """
+
+    def __init__(
+        self,
+        pages: int = 60,
+        shell_pages: int = 10,
+        latency_ms: float = 0.0,
+        seed: int = 7,
+    ):
+        rng = random.Random(seed)
+        routes: Dict[str, str] = {}
+
+        for i in range(pages):
+            routes[f"/docs/{i}"] = _static_page(rng, i, pages, shell_pages)
+        for i in range(shell_pages):
+            routes[f"/app/{i}"] = _shell_page(rng, i)
+
+        index_links = "".join(f'<li><a href="{p}">{p}</a></li>' for p in routes)
+        routes["/"] = (
+            "<!doctype html><html><head><title>Fixture site</title></head>"
+            f"<body><main><h1>Fixture site</h1><p>{paragraph(rng, 20)}</p>"
+            f"<ul>{index_links}</ul></main></body></html>"
+        )
+
+        self.routes = routes
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+
+                path = self.path.split("?")[0].rstrip("/") or "/"
+                if path == "/sitemap.xml":
+                    body, ctype = site.sitemap().encode(), "application/xml"
+                elif path in site.routes:
+                    body, ctype = site.routes[path].encode(), "text/html; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        super().__init__(Handler)
+
+    def sitemap(self) -> str:
+        urls = "".join(
+            f"<url><loc>{self.url}{p}</loc><lastmod>2024-01-01</lastmod></url>"
+            for p in self.routes
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f"{urls}</urlset>"
+        )
+
+
+# --------------------------------------------------
+# PDF corpus
+# --------------------------------------------------
+def _escape_pdf(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_pdf(pages: List[List[str]]) -> bytes:
+    """
+    Minimal PDF with a text layer (Helvetica), one list of lines per page.
+    """
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")   # filled in once the page tree exists
+    tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    kids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        ops += [f"({_escape_pdf(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        content = add(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (tree, font, content)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % tree
+    objects[tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % n + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref,
+    )
+    return bytes(out)
+
+
+def scanned_pdf(pages: List[List[str]], path: str):
+    """
+    Image-only PDF (no text layer) → every page goes through OCR.
+    """
+    from PIL import Image, ImageDraw   # pillow is already a dependency
+
+    images = []
+    for lines in pages:
+        img = Image.new("L", (1240, 1754), 255)   # A4 @ 150 dpi
+        draw = ImageDraw.Draw(img)
+        for n, line in enumerate(lines):
+            draw.text((80, 80 + n * 24), line, fill=0)
+        images.append(img)
+
+    images[0].save(path, "PDF", resolution=150, save_all=True,
+                   append_images=images[1:])
+
+
+def _pdf_lines(rng: random.Random, n_pages: int) -> List[List[str]]:
+    pages = []
+    for _ in range(n_pages):
+        lines = []
+        for _ in range(55):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 13))]
+            lines.append(" ".join(words))
+        pages.append(lines)
+    return pages
+
+
+def make_pdf_corpus(
+    out_dir: str,
+    text_docs: int = 4,
+    text_pages: int = 20,
+    scanned_docs: int = 1,
+    scanned_pages: int = 4,
+    seed: int = 11,
+) -> List[Tuple[str, str]]:
+    """
+    Writes the corpus into out_dir → [(kind, path)].
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = []
+
+    for i in range(text_docs):
+        path = os.path.join(out_dir, f"text_{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(text_pdf(_pdf_lines(rng, text_pages)))
+        corpus.append(("text", path))
+
+    for i in range(scanned_docs):
+        path = os.path.join(out_dir, f"scanned_{i}.pdf")
+        scanned_pdf(_pdf_lines(rng, scanned_pages), path)
+        corpus.append(("scanned", path))
+
+    return corpus
+
+
+# --------------------------------------------------
+# Embedding server (OpenAI-compatible)
+# --------------------------------------------------
+def fake_vector(item, dims: int) -> List[float]:
+    """
+    Deterministic unit vector per input (string or token list).
+    """
+    seed = hashlib.sha1(json.dumps(item).encode()).digest()
+    rng = random.Random(seed)
+    v = [rng.gauss(0, 1) for _ in range(dims)]
+    norm = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norm for x in v]
+
+
+class EmbeddingServer(_Server):
+    """
+    POST /v1/embeddings with a fixed per-request latency plus a
+    per-input cost, so batching shows up in the numbers.
+    """
+
+    def __init__(
+        self,
+        dims: int = 1536,
+        latency_ms: float = 50.0,
+        per_input_ms: float = 0.2,
+    ):
+        self.dims = dims
+        self.latency = latency_ms / 1000
+        self.per_input = per_input_ms / 1000
+        self.requests = 0
+        self.inputs = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                req = json.loads(self.rfile.read(length) or b"{}")
+                inputs = req.get("input") or []
+                if isinstance(inputs, str) or (
+                    inputs and isinstance(inputs[0], int)
+                ):
+                    inputs = [inputs]
+
+                server.requests += 1
+                server.inputs += len(inputs)
+                time.sleep(server.latency + server.per_input * len(inputs))
+
+                dims = req.get("dimensions") or server.dims
+                base64_out = req.get("encoding_format") == "base64"
+                data = []
+                for i, item in enumerate(inputs):
+                    v = fake_vector(item, dims)
+                    if base64_out:
+                        v = base64.b64encode(struct.pack(f"<{dims}f", *v)).decode()
+                    data.append({"object": "embedding", "index": i, "embedding": v})
+
+                body = json.dumps({
+                    "object": "list",
+                    "data": data,
+                    "model": req.get("model"),
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        super().__init__(Handler)
+
+
+# --------------------------------------------------
+# Pinecone Index stand-in
+# --------------------------------------------------
+class InMemoryIndex:
+    """
+    Enough of pinecone.Index for PineconeRepo: upsert / query / delete.
+    Upsert calls are timed so the benchmark can report their latency.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.namespaces: Dict[str, Dict[str, Dict]] = {}
+        self.upsert_seconds: List[float] = []
+        self._lock = threading.Lock()
+
+    def upsert(self, *, vectors: List[Dict], namespace: str):
+        t0 = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            ns = self.namespaces.setdefault(namespace, {})
+            for v in vectors:
+                ns[v["id"]] = v
+            self.upsert_seconds.append(time.perf_counter() - t0)
+        return {"upserted_count": len(vectors)}
+
+    def query(
+        self,
+        *,
+        vector: List[float],
+        top_k: int,
+        namespace: str,
+        filter: Optional[Dict] = None,
+        include_metadata: bool = True,
+    ):
+        with self._lock:
+            items = list(self.namespaces.get(namespace, {}).values())
+
+        scored = sorted(
+            (
+                (sum(a * b for a, b in zip(vector, v["values"])), v)
+                for v in items
+            ),
+            key=lambda s: -s[0],
+        )[:top_k]
+        return {
+            "matches": [
+                {"id": v["id"], "score": score, "metadata": v.get("metadata")}
+                for score, v in scored
+            ]
+        }
+
+    def delete(self, *, namespace: str, ids: Optional[List[str]] = None,
+               delete_all: bool = False):
+        with self._lock:
+            ns = self.namespaces.setdefault(namespace, {})
+            if delete_all:
+                ns.clear()
+            for i in ids or ():
+                ns.pop(i, None)
+
+    def describe_index_stats(self):
+        with self._lock:
+            return {
+                "namespaces": {
+                    k: {"vector_count": len(v)}
+                    for k, v in self.namespaces.items()
+                }
+            }
+
+    def vector_count(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self.namespaces.values())
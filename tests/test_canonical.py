@@ -0,0 +1,86 @@
+# tests/test_canonical.py
+#
+# Redirect targets always merge; rel=canonical only merges pages whose
+# text matches the page already kept under the target.
+import asyncio
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("USE_CELERY", "false")
+
+from app.crawlers import smart_crawler  # noqa: E402
+
+TEXT = "Plenty of real page content here. " * 20
+CANONICAL_ROOT = '<link rel="canonical" href="/">'
+
+PAGES = {
+    # path: (head, text)
+    "/": ("", TEXT),
+    "/mirror": (CANONICAL_ROOT, TEXT),                      # same text → merged
+    "/article": (CANONICAL_ROOT, "A different article. " * 20),   # bad template
+    "/new": ("", "The page behind a redirect. " * 20),
+}
+
+
+class _Site(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/old":
+            self.send_response(301)
+            self.send_header("Location", "/new")
+            self.end_headers()
+            return
+
+        head, text = PAGES[self.path]
+        links = "" if self.path != "/" else "".join(
+            f'<a href="{p}">x</a>' for p in ("/mirror", "/article", "/old", "/new")
+        )
+        body = (
+            f"<html><head><title>{self.path}</title>{head}</head><body>"
+            f"<nav>{links}</nav><main><p>{text}</p></main>"
+            f"<!--{'x' * 2000}--></body></html>"
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    monkeypatch.setattr(smart_crawler, "USE_SITEMAP", False)
+    monkeypatch.setattr(smart_crawler, "USE_COMMON_ROUTES", False)
+    monkeypatch.setattr(smart_crawler, "POLITE_DELAY_SEC", 0)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Site)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_canonical_and_redirect_merging(site):
+    # One worker: the root is kept before its outlinks are fetched
+    pages = asyncio.run(smart_crawler.smart_crawl_async(
+        site, max_pages=10, max_depth=1, concurrency=1,
+    ))
+    urls = sorted(p["url"].replace(site, "") for p in pages)
+
+    assert urls == ["", "/article", "/new"]
+
+
+def test_canonicalize_url():
+    canon = smart_crawler.canonicalize_url
+    ident = smart_crawler.url_identity
+
+    assert canon("HTTP://WWW.Example.com:80/a/index.html?utm_source=x&b=2&a=1#f") == (
+        "http://www.example.com/a?a=1&b=2"
+    )
+    assert canon("https://example.com/a/;jsessionid=ABC?sid=1") == "https://example.com/a"
+    assert ident("http://www.example.com/x/") == ident("https://example.com/x")
+    assert ident("https://example.com/x?page=2") != ident("https://example.com/x")
@@ -0,0 +1,108 @@
+# tests/test_incremental_errors.py
+#
+# Known pages that answer 404/410 must come back "gone" (vectors removed),
+# 5xx must come back "error" (state and vectors kept) — never as fetched
+# content that gets re-embedded.
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+os.environ.setdefault("USE_CELERY", "false")
+
+from app.crawlers import smart_crawler  # noqa: E402
+from app.services import incremental  # noqa: E402
+
+BODY = "<p>" + "Plenty of real page content here. " * 20 + "</p>"
+ERRORS = {"/gone": 404, "/removed": 410, "/flaky": 503}
+
+
+class _Site(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path in ERRORS:
+            body = b"<html><body><p>Error page</p></body></html>"
+            self.send_response(ERRORS[self.path])
+        else:
+            links = "".join(f'<a href="{p}">x</a>' for p in ERRORS)
+            body = (
+                f"<html><head><title>Home</title></head><body><main>"
+                f"{links}{BODY}</main><!--{'x' * 2000}--></body></html>"
+            ).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def site(monkeypatch):
+    monkeypatch.setattr(smart_crawler, "USE_SITEMAP", False)
+    monkeypatch.setattr(smart_crawler, "USE_COMMON_ROUTES", False)
+    monkeypatch.setattr(smart_crawler, "POLITE_DELAY_SEC", 0)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Site)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_error_statuses_on_known_pages(site, monkeypatch):
+    rendered = []
+
+    async def render(url):
+        rendered.append(url)
+        return "<html><body><main>" + BODY + "</main></body></html>"
+
+    monkeypatch.setattr(smart_crawler, "render_js_page_async", render)
+
+    prior = {
+        f"{site}{path}": {"hash": "old", "chunks": 2, "title": path}
+        for path in ERRORS
+    }
+    pages = smart_crawler.smart_crawl(site, max_pages=10, max_depth=1, prior=prior)
+    status = {p["url"].replace(site, ""): p["status"] for p in pages}
+
+    assert status == {
+        "": "fetched",
+        "/gone": "gone",
+        "/removed": "gone",
+        "/flaky": "error",
+    }
+    assert rendered == []   # error pages are never JS-rendered
+
+    # -------- sync: nothing re-embedded, only 404/410 deleted --------
+    embedded, deleted, saved = [], [], {}
+
+    def build(*, userId, pages, deduper=None):
+        embedded.extend(p["url"] for p in pages)
+        return {p["url"]: 1 for p in pages}
+
+    class Pinecone:
+        def delete_ids(self, *, userId, ids):
+            deleted.extend(ids)
+
+    class State:
+        def save(self, userId, source, state):
+            saved.update(state)
+
+    monkeypatch.setattr(incremental, "build_web_embeddings", build)
+    monkeypatch.setattr(incremental, "get_pinecone_repo", Pinecone)
+    monkeypatch.setattr(incremental, "get_crawl_state_repo", State)
+    monkeypatch.setattr(incremental, "get_chunk_store", lambda: None)
+
+    stats = incremental.sync_web_pages(
+        userId="u", source=site, pages=pages, prior=prior, truncated=False,
+    )
+
+    assert embedded == [site]
+    assert stats["removed"] == 2 and stats["failed"] == 1
+    assert len(deleted) == 4   # 2 chunks × /gone, /removed
+    assert saved[f"{site}/flaky"] == prior[f"{site}/flaky"]
+    assert f"{site}/gone" not in saved and f"{site}/removed" not in saved